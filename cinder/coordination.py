@@ -16,6 +16,7 @@
 """Coordination and locking utilities."""
 
 import inspect
+import string
 import uuid
 
 import decorator
@@ -133,11 +134,25 @@ def synchronized(lock_name, blocking=True, coordinator=COORDINATOR):
     `f_name` as a decorated function name.
     """
 
+    # Parse the lock name template only once, getting the call arguments is
+    # expensive and it is not needed when only `f_name` is used.
+    field_names = {field_name for __, field_name, __, __
+                   in string.Formatter().parse(lock_name) if field_name}
+    needs_call_args = bool(field_names - {'f_name'})
+    # A name without fields is still formatted to unescape doubled braces.
+    static_name = None if field_names else lock_name.format()
+
     @decorator.decorator
     def _synchronized(f, *a, **k):
-        call_args = inspect.getcallargs(f, *a, **k)
-        call_args['f_name'] = f.__name__
-        lock = coordinator.get_lock(lock_name.format(**call_args))
+        if needs_call_args:
+            call_args = inspect.getcallargs(f, *a, **k)
+            call_args['f_name'] = f.__name__
+            name = lock_name.format(**call_args)
+        elif field_names:
+            name = lock_name.format(f_name=f.__name__)
+        else:
+            name = static_name
+        lock = coordinator.get_lock(name)
         t1 = timeutils.now()
         t2 = None
         try:
@@ -273,6 +273,11 @@ def volume_get(context, volume_id):
     return IMPL.volume_get(context, volume_id)
 
 
+def volume_bootable_get(context, volume_id):
+    """Get the bootable flag of a volume or raise if it does not exist."""
+    return IMPL.volume_bootable_get(context, volume_id)
+
+
 def volume_get_all(context, marker=None, limit=None, sort_keys=None,
                    sort_dirs=None, filters=None, offset=None):
     """Get all volumes."""
@@ -2127,6 +2127,19 @@ def volume_get(context, volume_id):
     return _volume_get(context, volume_id)
 
 
+@require_context
+def volume_bootable_get(context, volume_id):
+    result = model_query(context, models.Volume.bootable,
+                         project_only=True).\
+        filter_by(id=volume_id).\
+        first()
+
+    if not result:
+        raise exception.VolumeNotFound(volume_id=volume_id)
+
+    return result.bootable
+
+
 @require_admin_context
 def volume_get_all(context, marker=None, limit=None, sort_keys=None,
                    sort_dirs=None, filters=None, offset=None):
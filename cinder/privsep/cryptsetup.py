@@ -0,0 +1,36 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Helpers for cryptsetup related routines
+"""
+
+from oslo_concurrency import processutils
+
+import cinder.privsep
+
+
+@cinder.privsep.sys_admin_pctxt.entrypoint
+def luks_change_key(device_path, passphrases):
+    processutils.execute(
+        'cryptsetup', 'luksChangeKey', device_path, '--force-password',
+        process_input=passphrases,
+        log_errors=processutils.LOG_ALL_ERRORS)
+
+
+@cinder.privsep.sys_admin_pctxt.entrypoint
+def luks_format(device_path, luks_type, cipher, key_size, passphrase):
+    processutils.execute(
+        'cryptsetup', '--batch-mode', 'luksFormat', '--force-password',
+        '--type', luks_type, '--cipher', cipher, '--key-size', str(key_size),
+        '--key-file=-', device_path,
+        process_input=passphrase)
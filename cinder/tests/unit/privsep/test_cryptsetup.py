@@ -0,0 +1,44 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the cryptsetup privsep helpers."""
+
+from unittest import mock
+
+from oslo_concurrency import processutils
+
+import cinder.privsep
+from cinder.privsep import cryptsetup
+from cinder.tests.unit import test
+
+
+@mock.patch.object(cinder.privsep.sys_admin_pctxt, 'client_mode', False)
+@mock.patch('oslo_concurrency.processutils.execute')
+class CryptsetupTestCase(test.TestCase):
+
+    def test_luks_change_key(self, mock_execute):
+        cryptsetup.luks_change_key('/dev/fake', 'old\nnew\n')
+
+        mock_execute.assert_called_once_with(
+            'cryptsetup', 'luksChangeKey', '/dev/fake', '--force-password',
+            process_input='old\nnew\n',
+            log_errors=processutils.LOG_ALL_ERRORS)
+
+    def test_luks_format(self, mock_execute):
+        cryptsetup.luks_format('/dev/fake', 'luks1', 'aes-xts-plain64', 256,
+                               'passphrase')
+
+        mock_execute.assert_called_once_with(
+            'cryptsetup', '--batch-mode', 'luksFormat', '--force-password',
+            '--type', 'luks1', '--cipher', 'aes-xts-plain64',
+            '--key-size', '256', '--key-file=-', '/dev/fake',
+            process_input='passphrase')
@@ -113,3 +113,33 @@ class CoordinationTestCase(test.TestCase):
         func(foo, bar)
         get_lock.assert_called_with('lock-func-7-8')
         self.assertEqual(['foo', 'bar'], inspect.getfullargspec(func)[0])
+
+    @mock.patch('inspect.getcallargs')
+    def test_synchronized_no_call_args(self, mock_getcallargs, get_lock):
+        @coordination.synchronized('lock-{f_name}')
+        def func(foo):
+            pass
+
+        @coordination.synchronized('lock')
+        def func2(foo):
+            pass
+
+        func(mock.sentinel.foo)
+        get_lock.assert_called_with('lock-func')
+        func2(mock.sentinel.foo)
+        get_lock.assert_called_with('lock')
+        mock_getcallargs.assert_not_called()
+
+    def test_synchronized_escaped_braces(self, get_lock):
+        @coordination.synchronized('lock-{{static}}')
+        def func(foo):
+            pass
+
+        @coordination.synchronized('lock-{{static}}-{f_name}')
+        def func2(foo):
+            pass
+
+        func(mock.sentinel.foo)
+        get_lock.assert_called_with('lock-{static}')
+        func2(mock.sentinel.foo)
+        get_lock.assert_called_with('lock-{static}-func2')
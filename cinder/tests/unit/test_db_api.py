@@ -713,6 +713,16 @@ class DBAPIVolumeTestCase(BaseTest):
         self._assertEqualObjects(volume, db.volume_get(self.ctxt,
                                                        volume['id']))
 
+    def test_volume_bootable_get(self):
+        volume = db.volume_create(self.ctxt,
+                                  {'volume_type_id': fake.VOLUME_TYPE_ID,
+                                   'bootable': True})
+        self.assertIs(True, db.volume_bootable_get(self.ctxt, volume['id']))
+
+    def test_volume_bootable_get_not_found(self):
+        self.assertRaises(exception.VolumeNotFound, db.volume_bootable_get,
+                          self.ctxt, fake.VOLUME_ID)
+
     @mock.patch('oslo_utils.timeutils.utcnow', return_value=UTC_NOW)
     def test_volume_destroy(self, utcnow_mock):
         volume = db.volume_create(self.ctxt,
@@ -1275,6 +1275,25 @@ class VolumeUtilsTestCase(test.TestCase):
                           volume_utils.require_driver_initialized,
                           driver)
 
+    @mock.patch('cinder.volume.volume_utils.brick_get_connector_properties',
+                return_value={'initiator': 'iqn.1993-08.org.debian:01:1'})
+    def test_brick_get_cached_connector_properties(self, mock_get_props):
+        self.addCleanup(volume_utils.clear_connector_properties_cache)
+        first = volume_utils.brick_get_cached_connector_properties()
+        first['initiator'] = 'changed'
+        second = volume_utils.brick_get_cached_connector_properties()
+        volume_utils.brick_get_cached_connector_properties(True, False)
+
+        self.assertEqual({'initiator': 'iqn.1993-08.org.debian:01:1'},
+                         second)
+        mock_get_props.assert_has_calls([mock.call(False, False),
+                                         mock.call(True, False)])
+        self.assertEqual(2, mock_get_props.call_count)
+
+        volume_utils.clear_connector_properties_cache()
+        volume_utils.brick_get_cached_connector_properties()
+        self.assertEqual(3, mock_get_props.call_count)
+
 
 @ddt.ddt
 class LogTracingTestCase(test.TestCase):
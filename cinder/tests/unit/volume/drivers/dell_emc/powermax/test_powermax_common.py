@@ -18,6 +18,7 @@ from copy import deepcopy
 import time
 from unittest import mock
 
+import eventlet
 import six
 
 from cinder import exception
@@ -715,7 +716,9 @@ class PowerMaxCommonTest(test.TestCase):
         ref_dict = {'hostlunid': int(host_lun, 16),
                     'maskingview': self.data.masking_view_name_f,
                     'array': self.data.array,
-                    'device_id': self.data.device_id}
+                    'device_id': self.data.device_id,
+                    'portgroup': self.data.port_group_name_f,
+                    'target_wwns': self.data.target_wwns}
         device_info_dict = self.common.initialize_connection(volume, connector)
         self.assertEqual(ref_dict, device_info_dict)
 
@@ -738,7 +741,9 @@ class PowerMaxCommonTest(test.TestCase):
             ref_dict = {'hostlunid': int(host_lun, 16),
                         'maskingview': self.data.masking_view_name_f,
                         'array': self.data.array,
-                        'device_id': self.data.device_id}
+                        'device_id': self.data.device_id,
+                        'portgroup': self.data.port_group_name_f,
+                        'target_wwns': self.data.target_wwns}
             device_info_dict = self.common.initialize_connection(volume,
                                                                  connector)
             self.assertEqual(ref_dict, device_info_dict)
@@ -758,7 +763,9 @@ class PowerMaxCommonTest(test.TestCase):
         masking_view_dict[utils.IS_MULTIATTACH] = False
         device_info_dict = self.common.initialize_connection(
             volume, connector)
-        self.assertEqual({}, device_info_dict)
+        self.assertEqual({'portgroup': self.data.port_group_name_f,
+                          'target_wwns': self.data.target_wwns},
+                         device_info_dict)
         mock_attach.assert_called_once_with(
             volume, connector, extra_specs, masking_view_dict)
 
@@ -775,7 +782,9 @@ class PowerMaxCommonTest(test.TestCase):
         connector = self.data.connector
         device_info_dict = self.common.initialize_connection(
             volume, connector)
-        self.assertEqual({}, device_info_dict)
+        self.assertEqual({'portgroup': self.data.port_group_name_f,
+                          'target_wwns': self.data.target_wwns},
+                         device_info_dict)
 
     @mock.patch.object(
         masking.PowerMaxMasking, 'pre_multiattach',
@@ -1111,6 +1120,30 @@ class PowerMaxCommonTest(test.TestCase):
             array, self.data.test_volume, device_id, host)
         self.assertEqual([], maskingview_list)
 
+    def test_get_masking_views_from_volume_for_hosts(self):
+        array = self.data.array
+        device_id = self.data.device_id
+        ref_mv_list = [self.data.masking_view_name_f]
+        with mock.patch.object(
+                self.common, '_get_mvs_and_sgs_from_volume',
+                side_effect=self.common._get_mvs_and_sgs_from_volume) as mck:
+            maskingview_list, is_metro, host = (
+                self.common.get_masking_views_from_volume_for_hosts(
+                    array, self.data.test_volume, device_id,
+                    ['DifferentHost', 'HostX']))
+            self.assertEqual(ref_mv_list, maskingview_list)
+            self.assertFalse(is_metro)
+            self.assertEqual('HostX', host)
+            mck.assert_called_once_with(array, device_id)
+
+    def test_get_masking_views_from_volume_for_hosts_no_match(self):
+        maskingview_list, __, host = (
+            self.common.get_masking_views_from_volume_for_hosts(
+                self.data.array, self.data.test_volume, self.data.device_id,
+                ['DifferentHost', 'OtherHost']))
+        self.assertEqual([], maskingview_list)
+        self.assertEqual('OtherHost', host)
+
     def test_find_host_lun_id_no_host_check(self):
         volume = self.data.test_volume
         extra_specs = self.data.extra_specs
@@ -2977,6 +3010,41 @@ class PowerMaxCommonTest(test.TestCase):
             mock_cleanup.assert_called_once()
             mock_remove.assert_called_once()
 
+    def test_run_concurrently(self):
+        calls = list()
+
+        def _double(item):
+            calls.append(item)
+            return item * 2
+
+        results = list(self.common._run_concurrently(_double, [1, 2, 3]))
+        self.assertEqual([2, 4, 6], results)
+        self.assertEqual([1, 2, 3], sorted(calls))
+
+    @mock.patch.object(common, 'GROUP_VOLUME_CONCURRENCY', 2)
+    def test_run_concurrently_exception(self):
+        calls = list()
+        results = list()
+
+        def _fail_first(item):
+            calls.append(item)
+            if item == 1:
+                # Let item 2 start before this one fails.
+                eventlet.sleep(0)
+                raise exception.VolumeBackendAPIException(message='failed')
+            return item
+
+        def _run():
+            for result in self.common._run_concurrently(
+                    _fail_first, [1, 2, 3, 4, 5]):
+                results.append(result)
+
+        self.assertRaises(exception.VolumeBackendAPIException, _run)
+        # Items 1 and 2 were in flight together; nothing else was started
+        # after item 1 failed, and the result of item 2 was still returned.
+        self.assertEqual([1, 2], calls)
+        self.assertEqual([2], results)
+
     @mock.patch.object(rest.PowerMaxRest, 'get_volume_snapshot_list',
                        return_value=list())
     def test_delete_group_already_deleted(self, mck_get_snaps):
@@ -100,6 +100,19 @@ class PowerMaxFCTest(test.TestCase):
                     self.data.fc_device_info, self.data.test_volume,
                     self.data.connector)
 
+    def test_initialize_connection_no_device_info(self):
+        with mock.patch.object(self.common, 'initialize_connection',
+                               return_value={}):
+            with mock.patch.object(
+                    self.driver, 'populate_data') as mock_populate:
+                with mock.patch.object(fczm_utils,
+                                       'add_fc_zone') as mock_zone:
+                    conn_info = self.driver.initialize_connection(
+                        self.data.test_volume, self.data.connector)
+                    self.assertEqual({}, conn_info)
+                    mock_populate.assert_not_called()
+                    mock_zone.assert_not_called()
+
     def test_populate_data(self):
         with mock.patch.object(self.driver, '_build_initiator_target_map',
                                return_value=([], {})) as mock_build:
@@ -145,34 +158,75 @@ class PowerMaxFCTest(test.TestCase):
         self.assertEqual(ref_mappings, zoning_mappings2)
 
     def test_get_zoning_mappings_no_mv(self):
-        with mock.patch.object(self.common, 'get_masking_views_from_volume',
-                               return_value=(None, False)):
+        with mock.patch.object(self.common,
+                               'get_masking_views_from_volume_for_hosts',
+                               return_value=([], False, None)):
             zoning_mappings = self.driver._get_zoning_mappings(
                 self.data.test_volume, self.data.connector)
             self.assertEqual({}, zoning_mappings)
 
     @mock.patch.object(
-        common.PowerMaxCommon, 'get_masking_views_from_volume',
-        side_effect = ([(None, False),
-                        ([tpd.PowerMaxData.masking_view_name_f], False)]))
+        common.PowerMaxCommon, '_get_mvs_and_sgs_from_volume',
+        return_value=([tpd.PowerMaxData.masking_view_name_f], []))
     def test_get_zoning_mappings_retry_backward_compatibility(
-            self, mock_views):
+            self, mock_mvs):
         with mock.patch.object(self.common.utils, 'get_host_name_label',
-                               return_value=None) as mock_label:
-            self.driver._get_zoning_mappings(
-                self.data.test_volume, self.data.connector)
-            self.assertEqual(2, mock_label.call_count)
-            self.assertEqual(2, mock_views.call_count)
+                               return_value='NoMatch') as mock_label:
+            with mock.patch.object(self.driver, '_build_initiator_target_map',
+                                   return_value=([], {})):
+                zoning_mappings = self.driver._get_zoning_mappings(
+                    self.data.test_volume, self.data.connector)
+            self.assertEqual(self.data.port_group_name_f,
+                             zoning_mappings['port_group'])
+            mock_label.assert_called_once()
+            mock_mvs.assert_called_once()
 
     @mock.patch.object(
         common.PowerMaxCommon, 'get_masking_views_from_volume',
         return_value=([tpd.PowerMaxData.masking_view_name_f], True))
-    def test_get_zoning_mappings_metro(self, mock_mv):
+    @mock.patch.object(
+        common.PowerMaxCommon, 'get_masking_views_from_volume_for_hosts',
+        return_value=([tpd.PowerMaxData.masking_view_name_f], True,
+                      'HostX'))
+    def test_get_zoning_mappings_metro(self, mock_mv, mock_metro_mv):
         ref_mappings = self.data.zoning_mappings_metro
         zoning_mappings = self.driver._get_zoning_mappings(
             self.data.test_volume, self.data.connector)
         self.assertEqual(ref_mappings, zoning_mappings)
 
+    @mock.patch.object(
+        common.PowerMaxCommon, 'get_masking_views_from_volume_for_hosts',
+        return_value=([tpd.PowerMaxData.masking_view_name_f], True,
+                      'HostX'))
+    def test_get_zoning_mappings_metro_local_failure(self, mock_mv):
+        metro_thread = mock.Mock()
+        with mock.patch.object(
+                fc.eventlet, 'spawn', return_value=metro_thread), (
+                mock.patch.object(
+                    self.driver, '_get_masking_view_groups',
+                    side_effect=exception.VolumeBackendAPIException(
+                        'failed'))):
+            self.assertRaises(exception.VolumeBackendAPIException,
+                              self.driver._get_zoning_mappings,
+                              self.data.test_volume, self.data.connector)
+        metro_thread.kill.assert_called_once_with()
+        metro_thread.wait.assert_not_called()
+
+    def test_get_masking_view_groups(self):
+        portgroup, initiator_group = self.driver._get_masking_view_groups(
+            self.data.array, self.data.masking_view_name_f)
+        self.assertEqual(self.data.port_group_name_f, portgroup)
+        self.assertEqual(self.data.initiatorgroup_name_f, initiator_group)
+
+    def test_parse_location(self):
+        location = self.data.test_volume.provider_location
+        ref_location = {'array': self.data.array,
+                        'device_id': self.data.device_id}
+        self.assertEqual(ref_location, fc._parse_location(location))
+        with mock.patch('ast.literal_eval') as mock_eval:
+            self.assertEqual(ref_location, fc._parse_location(location))
+            mock_eval.assert_not_called()
+
     def test_cleanup_zones_other_vols_mapped(self):
         ref_data = {'driver_volume_type': 'fibre_channel',
                     'data': {}}
@@ -203,10 +257,56 @@ class PowerMaxFCTest(test.TestCase):
                     self.data.test_volume, self.data.connector)
                 self.assertEqual(ref_target_map, target_map)
 
+    def test_build_initiator_target_map_device_info_targets(self):
+        device_info = dict(self.data.fc_device_info,
+                           target_wwns=self.data.target_wwns)
+        with mock.patch.object(
+                self.common,
+                'get_target_wwns_from_masking_view') as mck_wwns:
+            targets, target_map = self.driver._build_initiator_target_map(
+                self.data.test_volume, self.data.connector,
+                device_info=device_info)
+            mck_wwns.assert_not_called()
+        self.assertEqual(self.data.target_wwns, targets)
+
+    def test_build_initiator_target_map_shared_target_lists(self):
+        init_a, init_b = self.data.connector['wwpns']
+        mapping = {
+            'fabric_a': {'initiator_port_wwn_list': [init_a],
+                         'target_port_wwn_list': [self.data.wwnn1]},
+            'fabric_b': {'initiator_port_wwn_list': [init_b],
+                         'target_port_wwn_list': [self.data.wwnn1]}}
+        lookup_service = mock.Mock()
+        lookup_service.get_device_mapping_from_network.return_value = mapping
+        self.driver.zonemanager_lookup_service = lookup_service
+        with mock.patch.object(self.common,
+                               'get_target_wwns_from_masking_view',
+                               return_value=(self.data.target_wwns, [])):
+            targets, target_map = self.driver._build_initiator_target_map(
+                self.data.test_volume, self.data.connector)
+        self.assertEqual([self.data.wwnn1], targets)
+        self.assertEqual([self.data.wwnn1], target_map[init_a])
+        self.assertIs(target_map[init_a], target_map[init_b])
+
+    def test_build_initiator_target_map_no_lookup_service_metro(self):
+        fc_targets = list(self.data.target_wwns)
+        metro_targets = ['543210987654321', self.data.wwnn1]
+        ref_targets = fc_targets + metro_targets
+        with mock.patch.object(self.common,
+                               'get_target_wwns_from_masking_view',
+                               return_value=(fc_targets, metro_targets)):
+            targets, target_map = self.driver._build_initiator_target_map(
+                self.data.test_volume, self.data.connector)
+        self.assertEqual([self.data.wwnn1, '543210987654321'], targets)
+        for initiator in self.data.connector['wwpns']:
+            self.assertEqual(ref_targets, target_map[initiator])
+        self.assertEqual(self.data.target_wwns, fc_targets)
+
     def test_build_initiator_target_map_load_balanced(self):
         init_wwns = self.data.connector.get('wwpns')
         init_a, init_b = init_wwns[0], init_wwns[1]
         self.driver.performance.config = self.data.performance_config
+        self.driver.load_balance = True
         with mock.patch.object(
                 self.common, 'get_target_wwns_from_masking_view',
                 return_value=(self.data.target_wwns_multi, [])):
@@ -220,10 +320,27 @@ class PowerMaxFCTest(test.TestCase):
             self.assertTrue(
                 len(target_map.get(init_b)) < len(self.data.target_wwns_multi))
 
+    def test_build_initiator_target_map_load_balanced_portgroup(self):
+        self.driver.performance.config = self.data.performance_config
+        self.driver.load_balance = True
+        device_info = dict(self.data.fc_device_info,
+                           portgroup=self.data.port_group_name_f)
+        with mock.patch.object(
+                self.common, 'get_target_wwns_from_masking_view',
+                return_value=(self.data.target_wwns_multi, [])):
+            with mock.patch.object(
+                    self.driver.rest,
+                    'get_element_from_masking_view') as mck_element:
+                self.driver._build_initiator_target_map(
+                    self.data.test_volume, self.data.connector,
+                    device_info=device_info)
+                mck_element.assert_not_called()
+
     def test_build_initiator_target_map_load_balanced_exception(self):
         ref_target_map = {'123456789012345': self.data.target_wwns_multi,
                           '123456789054321': self.data.target_wwns_multi}
         self.driver.performance.config = self.data.performance_config
+        self.driver.load_balance = True
         with mock.patch.object(
             self.common, 'get_target_wwns_from_masking_view',
                 return_value=(self.data.target_wwns_multi, [])) as mck_wwns:
@@ -234,7 +351,7 @@ class PowerMaxFCTest(test.TestCase):
                     self.data.test_volume, self.data.connector,
                     device_info=self.data.iscsi_device_info)
                 self.assertEqual(ref_target_map, target_map)
-                self.assertEqual(mck_wwns.call_count, 2)
+                self.assertEqual(mck_wwns.call_count, 1)
 
     def test_extend_volume(self):
         with mock.patch.object(self.common, 'extend_volume') as mock_extend:
@@ -176,7 +176,10 @@ class PowerMaxReplicationTest(test.TestCase):
                     'device_id': self.data.device_id,
                     'hostlunid': 3,
                     'maskingview': self.data.masking_view_name_f,
-                    'metro_hostlunid': 3}
+                    'metro_hostlunid': 3,
+                    'portgroup': self.data.port_group_name_f,
+                    'target_wwns': self.data.target_wwns,
+                    'metro_target_wwns': self.data.target_wwns}
         self.assertEqual(ref_dict, info_dict)
 
     @mock.patch.object(rest.PowerMaxRest, 'get_iscsi_ip_address_and_iqn',
@@ -386,6 +389,49 @@ class PowerMaxReplicationTest(test.TestCase):
                               'updates': 'grp_updates'}]
         self.assertEqual(group_updates_ref, group_updates)
 
+    @mock.patch.object(
+        common.PowerMaxCommon, '_update_volume_list_from_sync_vol_list',
+        side_effect=lambda vols, group_fo: [{'volume_id': vols[0].id}])
+    @mock.patch.object(common.PowerMaxCommon, '_initial_setup',
+                       return_value=tpd.PowerMaxData.ex_specs_rep_config_sync)
+    def test_populate_volume_and_group_update_lists_multi_rdf_groups(
+            self, mck_setup, mck_from_sync):
+        volumes = [self.data.test_volume, self.data.test_rep_volume]
+        with mock.patch.object(
+                self.common.utils, 'get_rep_config',
+                side_effect=[{'rdf_group_label': 'grp_1'},
+                             {'rdf_group_label': 'grp_2'}]):
+            volume_updates, __ = (
+                self.common._populate_volume_and_group_update_lists(
+                    volumes, [], None))
+        self.assertEqual(2, mck_from_sync.call_count)
+        self.assertEqual([{'volume_id': vol.id} for vol in volumes],
+                         volume_updates)
+
+    @mock.patch.object(common, 'FAILOVER_GROUP_CONCURRENCY', 1)
+    @mock.patch.object(common.PowerMaxCommon, '_initial_setup',
+                       return_value=tpd.PowerMaxData.ex_specs_rep_config_sync)
+    def test_populate_volume_and_group_update_lists_rdf_group_fails(
+            self, mck_setup):
+        volumes = [self.data.test_volume, self.data.test_rep_volume,
+                   self.data.test_clone_volume]
+        with mock.patch.object(
+                self.common.utils, 'get_rep_config',
+                side_effect=[{'rdf_group_label': 'grp_1'},
+                             {'rdf_group_label': 'grp_2'},
+                             {'rdf_group_label': 'grp_3'}]), (
+                mock.patch.object(
+                    self.common, '_update_volume_list_from_sync_vol_list',
+                    side_effect=[[{'volume_id': volumes[0].id}],
+                                 exception.VolumeBackendAPIException(
+                                     'failover failed')])) as mck_from_sync:
+            self.assertRaises(
+                exception.VolumeBackendAPIException,
+                self.common._populate_volume_and_group_update_lists,
+                volumes, [], None)
+        # No group is failed over once a failover has failed.
+        self.assertEqual(2, mck_from_sync.call_count)
+
     @mock.patch.object(common.PowerMaxCommon, '_initial_setup',
                        return_value=tpd.PowerMaxData.extra_specs)
     def test_populate_volume_and_group_update_lists_promotion_non_rep(
@@ -1127,16 +1127,63 @@ class PowerMaxRestTest(test.TestCase):
     def test_get_element_from_masking_view_failed(self):
         array = self.data.array
         maskingview_name = self.data.masking_view_name_f
-        # no element chosen
-        element = self.rest.get_element_from_masking_view(
-            array, maskingview_name)
-        self.assertIsNone(element)
         # cannot retrieve maskingview
         with mock.patch.object(self.rest, 'get_masking_view',
                                return_value=None):
             self.assertRaises(exception.VolumeBackendAPIException,
                               self.rest.get_element_from_masking_view,
                               array, maskingview_name)
+        # no element chosen
+        element = self.rest.get_element_from_masking_view(
+            array, maskingview_name)
+        self.assertIsNone(element)
+
+    def test_get_element_from_masking_view_cached(self):
+        array = self.data.array
+        maskingview_name = self.data.masking_view_name_f
+        with mock.patch.object(self.rest, 'get_masking_view',
+                               side_effect=self.rest.get_masking_view) as mck:
+            self.rest.get_element_from_masking_view(
+                array, maskingview_name, portgroup=True)
+            initiatorgroup = self.rest.get_element_from_masking_view(
+                array, maskingview_name, host=True)
+            self.assertEqual(self.data.initiatorgroup_name_f, initiatorgroup)
+            mck.assert_called_once_with(array, maskingview_name)
+
+    @mock.patch.object(rest, 'MASKING_VIEW_CACHE_SIZE', 2)
+    @mock.patch.object(rest.PowerMaxRest, 'get_masking_view',
+                       return_value={'portGroupId': 'pg'})
+    def test_get_cached_masking_view_evicts_oldest(self, mck_get):
+        array = self.data.array
+        with mock.patch.object(rest.time, 'time', return_value=0):
+            self.rest._get_cached_masking_view(array, 'mv_1')
+            self.rest._get_cached_masking_view(array, 'mv_2')
+            self.rest._get_cached_masking_view(array, 'mv_3')
+        self.assertEqual([(array, 'mv_2'), (array, 'mv_3')],
+                         list(self.rest.masking_view_cache))
+
+    @mock.patch.object(rest.PowerMaxRest, 'get_masking_view',
+                       return_value={'portGroupId': 'pg'})
+    def test_get_cached_masking_view_drops_expired(self, mck_get):
+        array = self.data.array
+        with mock.patch.object(rest.time, 'time', return_value=0):
+            self.rest._get_cached_masking_view(array, 'mv_1')
+        with mock.patch.object(
+                rest.time, 'time',
+                return_value=rest.MASKING_VIEW_CACHE_EXPIRATION):
+            self.rest._get_cached_masking_view(array, 'mv_2')
+        self.assertEqual([(array, 'mv_2')],
+                         list(self.rest.masking_view_cache))
+
+    @mock.patch.object(rest.PowerMaxRest, 'delete_resource')
+    def test_delete_masking_view_clears_cache(self, mck_delete):
+        array = self.data.array
+        maskingview_name = self.data.masking_view_name_f
+        self.rest.get_element_from_masking_view(
+            array, maskingview_name, portgroup=True)
+        self.rest.delete_masking_view(array, maskingview_name)
+        self.assertNotIn((array, maskingview_name),
+                         self.rest.masking_view_cache)
 
     def test_get_common_masking_views(self):
         array = self.data.array
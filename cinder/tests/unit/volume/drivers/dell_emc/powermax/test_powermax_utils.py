@@ -96,6 +96,19 @@ class PowerMaxUtilsTest(test.TestCase):
         host4 = self.utils.get_host_short_name(host_with_period)
         self.assertEqual(ref_host_name, host4)
 
+    def test_get_host_short_name_cached(self):
+        host_name = 'host_over_16_chars_host_over_16_chars_cached'
+        ref_host_name = self.utils.get_host_short_name(host_name)
+        with mock.patch.object(
+                utils.PowerMaxUtils,
+                'generate_unique_trunc_host') as mck_trunc:
+            self.assertEqual(
+                ref_host_name, self.utils.get_host_short_name(host_name))
+            self.assertEqual(
+                ref_host_name,
+                utils.PowerMaxUtils().get_host_short_name(host_name))
+            mck_trunc.assert_not_called()
+
     def test_get_volume_element_name(self):
         volume_id = 'ea95aa39-080b-4f11-9856-a03acf9112ad'
         volume_element_name = self.utils.get_volume_element_name(volume_id)
@@ -16,8 +16,10 @@
 #
 """Unit tests for OpenStack Cinder Seagate driver."""
 
+import collections
 from unittest import mock
 
+import eventlet
 from lxml import etree
 import requests
 
@@ -71,6 +73,12 @@ response_not_ok = '''<RESPONSE><OBJECT basetype="status" name="status" oid="1">
                   <PROPERTY name="response">Error Message</PROPERTY>
                   <PROPERTY name="return-code">1</PROPERTY>
                   </OBJECT></RESPONSE>'''
+response_not_found = '''<RESPONSE><OBJECT basetype="status" name="status"
+                     oid="1">
+                     <PROPERTY name="response">The volume was not found on
+                     this system.</PROPERTY>
+                     <PROPERTY name="return-code">-10050</PROPERTY>
+                     </OBJECT></RESPONSE>'''
 response_stats_linear = '''<RESPONSE><OBJECT basetype="virtual-disks">
                     <PROPERTY name="size-numeric">3863830528</PROPERTY>
                     <PROPERTY name="freespace-numeric">3863830528</PROPERTY>
@@ -180,7 +188,7 @@ class TestSeagateClient(test.TestCase):
         self.client = STXClient(self.ip, self.login, self.passwd,
                                 self.protocol, self.ssl_verify)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_login(self, mock_requests_get):
         m = mock.Mock()
         mock_requests_get.return_value = m
@@ -199,6 +207,35 @@ class TestSeagateClient(test.TestCase):
         self.client.login()
         self.assertEqual(session_key, self.client._session_key)
 
+    @mock.patch.object(STXClient, '_api_request')
+    @mock.patch.object(STXClient, 'session_login')
+    def test_request_login_errors(self, mock_session_login,
+                                  mock_api_request):
+        mock_session_login.side_effect = [
+            stx_exception.ConnectionError(message='down'),
+            stx_exception.AuthenticationError]
+        ex = self.assertRaises(stx_exception.ConnectionError,
+                               self.client._request, '/path')
+        self.assertIn('Failed to connect to Array 10.0.0.1: down',
+                      str(ex))
+        ex = self.assertRaises(stx_exception.AuthenticationError,
+                               self.client._request, '/path')
+        self.assertIn('(invalid login?)', str(ex))
+        mock_api_request.assert_not_called()
+
+    @mock.patch.object(STXClient, 'session_login')
+    def test_login_coalesced(self, mock_session_login):
+        def _session_login():
+            eventlet.sleep(0)
+            self.client._session_key = session_key
+
+        mock_session_login.side_effect = _session_login
+        pile = eventlet.GreenPile()
+        for __ in range(3):
+            pile.spawn(self.client.login)
+        list(pile)
+        mock_session_login.assert_called_once_with()
+
     def test_build_request_url(self):
         url = self.client._build_request_url('/path')
         self.assertEqual('http://10.0.0.1/api/path', url)
@@ -214,7 +251,7 @@ class TestSeagateClient(test.TestCase):
                                              arg2='val2')
         self.assertEqual('http://10.0.0.1/api/path/arg2/val2/arg1/arg3', url)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_request(self, mock_requests_get):
         self.client._session_key = session_key
 
@@ -232,6 +269,18 @@ class TestSeagateClient(test.TestCase):
                           self.client._api_request,
                           '/path')
 
+    @mock.patch.object(STXClient, '_api_request')
+    @mock.patch.object(STXClient, 'session_login')
+    def test_request_lazy_login(self, mock_session_login, mock_api_request):
+        self.client._request('/path')
+        mock_session_login.assert_called_once_with()
+
+        mock_session_login.reset_mock()
+        self.client._session_key = session_key
+        self.client._request('/path')
+        mock_session_login.assert_not_called()
+        self.assertEqual(2, mock_api_request.call_count)
+
     def test_assert_response_ok(self):
         ok_tree = etree.XML(response_ok)
         not_ok_tree = etree.XML(response_not_ok)
@@ -243,6 +292,20 @@ class TestSeagateClient(test.TestCase):
                           not_ok_tree)
         self.assertRaises(stx_exception.RequestError,
                           self.client._assert_response_ok, invalid_tree)
+        self.assertRaises(stx_exception.VolumeNotFoundError,
+                          self.client._assert_response_ok,
+                          etree.XML(response_not_found))
+
+    @mock.patch.object(STXClient, '_request')
+    def test_delete_volume_not_found(self, mock_request):
+        mock_request.side_effect = [stx_exception.VolumeNotFoundError(
+            message='not found (-10075)'), stx_exception.VolumeNotFoundError(
+            message='not found (-10050)'), stx_exception.RequestError(
+            message='error (-1)')]
+        self.assertIsNone(self.client.delete_volume('vol'))
+        self.assertIsNone(self.client.delete_volume('vol'))
+        self.assertRaises(stx_exception.RequestError,
+                          self.client.delete_volume, 'vol')
 
     @mock.patch.object(STXClient, '_request')
     def test_backend_exists(self, mock_request):
@@ -319,6 +382,15 @@ class TestSeagateClient(test.TestCase):
         self.client.delete_snapshot('dummy', 'paged')
         mock_request.assert_called_with('/delete/snapshot', 'dummy')
 
+    @mock.patch.object(STXClient, '_request')
+    def test_delete_snapshot_not_found(self, mock_request):
+        mock_request.side_effect = [stx_exception.VolumeNotFoundError(
+            message='not found (-10050)'), stx_exception.RequestError(
+            message='error (-1)')]
+        self.assertIsNone(self.client.delete_snapshot('dummy', 'paged'))
+        self.assertRaises(stx_exception.RequestError,
+                          self.client.delete_snapshot, 'dummy', 'paged')
+
     @mock.patch.object(STXClient, '_request')
     def test_list_luns_for_host(self, mock_request):
         mock_request.side_effect = [etree.XML(response_no_lun),
@@ -385,6 +457,14 @@ class TestFCSeagateCommon(test.TestCase):
         self.assertEqual(encoded_volid, self.common._get_vol_name(vol_id))
         self.assertEqual(encoded_snapid, self.common._get_snap_name(vol_id))
 
+    def test_encode_name_cached(self):
+        encode_uuid = cinder.volume.drivers.stx.common._encode_uuid
+        encode_uuid.cache_clear()
+        self.assertEqual(encoded_volid[1:], self.common._encode_name(vol_id))
+        self.assertEqual(encoded_volid[1:], self.common._encode_name(vol_id))
+        self.assertEqual(1, encode_uuid.cache_info().hits)
+        self.assertEqual(1, encode_uuid.cache_info().misses)
+
     def test_check_flags(self):
         class FakeOptions(object):
             def __init__(self, d):
@@ -409,6 +489,38 @@ class TestFCSeagateCommon(test.TestCase):
                           connector,
                           self.connector_element))
 
+    @mock.patch('time.monotonic')
+    @mock.patch.object(STXCommon, '_update_volume_stats')
+    def test_get_volume_stats_cached(self, mock_update, mock_time):
+        mock_time.side_effect = [100, 102, 106]
+        self.common.get_volume_stats(True)
+        self.common.get_volume_stats(True)
+        self.assertEqual(1, mock_update.call_count)
+        self.common.get_volume_stats(True)
+        self.assertEqual(2, mock_update.call_count)
+        self.common.get_volume_stats(False)
+        self.assertEqual(2, mock_update.call_count)
+
+    @mock.patch('time.monotonic')
+    @mock.patch.object(STXClient, 'get_active_iscsi_target_portals')
+    @mock.patch.object(STXClient, 'get_active_iscsi_target_iqns')
+    def test_get_active_iscsi_targets_cached(self, mock_iqns, mock_portals,
+                                             mock_time):
+        mock_time.side_effect = [100, 101, 110, 120, 140]
+        mock_iqns.return_value = ['id2']
+        mock_portals.return_value = {'10.0.0.11': 'Up'}
+
+        self.assertEqual(['id2'], self.common.get_active_iscsi_target_iqns())
+        self.assertEqual({'10.0.0.11': 'Up'},
+                         self.common.get_active_iscsi_target_portals())
+        self.assertEqual(['id2'], self.common.get_active_iscsi_target_iqns())
+        self.common.invalidate_target_ports_cache()
+        self.common.get_active_iscsi_target_portals()
+        self.assertEqual(1, mock_iqns.call_count)
+        self.assertEqual(2, mock_portals.call_count)
+        self.common.get_active_iscsi_target_iqns()
+        self.assertEqual(2, mock_iqns.call_count)
+
     @mock.patch.object(STXClient, 'backend_stats')
     def test_update_volume_stats(self, mock_stats):
         mock_stats.side_effect = [stx_exception.RequestError,
@@ -447,17 +559,14 @@ class TestFCSeagateCommon(test.TestCase):
 
     @mock.patch.object(STXClient, 'delete_volume')
     def test_delete_volume(self, mock_delete):
-        not_found_e = stx_exception.RequestError(
-            'The volume was not found on this system.')
-        mock_delete.side_effect = [not_found_e,
-                                   stx_exception.RequestError,
-                                   None]
-        self.assertIsNone(self.common.delete_volume(test_volume))
+        mock_delete.side_effect = [stx_exception.RequestError, None]
         self.assertRaises(exception.Invalid, self.common.delete_volume,
                           test_volume)
         self.assertIsNone(self.common.delete_volume(test_volume))
         mock_delete.assert_called_with(encoded_volid)
 
+    @mock.patch.object(cinder.volume.drivers.stx.common,
+                       'STATS_CACHE_TTL', 0)
     @mock.patch.object(STXClient, 'copy_volume')
     @mock.patch.object(STXClient, 'backend_stats')
     def test_create_cloned_volume(self, mock_stats, mock_copy):
@@ -483,6 +592,8 @@ class TestFCSeagateCommon(test.TestCase):
                                      self.common.backend_name,
                                      self.common.backend_type)
 
+    @mock.patch.object(cinder.volume.drivers.stx.common,
+                       'STATS_CACHE_TTL', 0)
     @mock.patch.object(STXClient, 'copy_volume')
     @mock.patch.object(STXClient, 'backend_stats')
     @mock.patch.object(STXCommon, 'extend_volume')
@@ -508,9 +619,12 @@ class TestFCSeagateCommon(test.TestCase):
                                      'vqqqqqqqqqqqqqqqqqqq',
                                      self.common.backend_name,
                                      self.common.backend_type)
-        mock_extend.assert_called_once_with(dest_volume_larger,
-                                            dest_volume_larger['size'])
+        mock_extend.assert_called_once_with(
+            dest_volume_larger, dest_volume_larger['size'],
+            old_size=detached_volume['size'])
 
+    @mock.patch.object(cinder.volume.drivers.stx.common,
+                       'STATS_CACHE_TTL', 0)
     @mock.patch.object(STXClient, 'get_volume_size')
     @mock.patch.object(STXClient, 'extend_volume')
     @mock.patch.object(STXClient, 'copy_volume')
@@ -538,6 +652,7 @@ class TestFCSeagateCommon(test.TestCase):
                                      self.common.backend_name,
                                      self.common.backend_type)
         mock_extend.assert_called_with('vqqqqqqqqqqqqqqqqqqq', '10GiB')
+        mock_get_size.assert_not_called()
 
     @mock.patch.object(STXClient, 'get_volume_size')
     @mock.patch.object(STXClient, 'extend_volume')
@@ -562,13 +677,7 @@ class TestFCSeagateCommon(test.TestCase):
 
     @mock.patch.object(STXClient, 'delete_snapshot')
     def test_delete_snapshot(self, mock_delete):
-        not_found_e = stx_exception.RequestError(
-            'The volume was not found on this system.')
-        mock_delete.side_effect = [not_found_e,
-                                   stx_exception.RequestError,
-                                   None]
-
-        self.assertIsNone(self.common.delete_snapshot(test_snap))
+        mock_delete.side_effect = [stx_exception.RequestError, None]
         self.assertRaises(exception.Invalid, self.common.delete_snapshot,
                           test_snap)
         self.assertIsNone(self.common.delete_snapshot(test_snap))
@@ -825,6 +934,52 @@ class TestSeagateISCSI(TestSeagateFC):
                                    'target_discovered': True,
                                    'target_portal': '10.0.0.11:3260'}}, ret)
 
+    @mock.patch.object(STXCommon,
+                       'get_active_iscsi_target_portals')
+    @mock.patch.object(STXCommon,
+                       'get_active_iscsi_target_iqns')
+    @mock.patch.object(STXCommon, 'map_volume')
+    def test_initialize_connection_no_portal(self, mock_map, mock_iqns,
+                                             mock_portals):
+        mock_map.return_value = 1
+        mock_iqns.return_value = ['id2']
+        mock_portals.return_value = {'10.0.0.12': 'Up'}
+        self.driver.iscsi_ips = ['10.0.0.11']
+        self.driver.initialize_iscsi_ports()
+
+        self.assertRaises(stx_exception.NotTargetPortal,
+                          self.driver.initialize_connection, test_volume,
+                          connector)
+
+    @mock.patch.object(STXCommon, 'do_setup')
+    def test_do_setup_chap_secret(self, mock_setup):
+        self.driver.iscsi_ips = ['10.0.0.11']
+        self.driver.configuration.use_chap_auth = True
+        self.driver.configuration.chap_password = 'short'
+        self.assertRaises(exception.InvalidInput,
+                          self.driver.do_setup, None)
+
+        self.driver.iscsi_ips = ['10.0.0.11']
+        self.driver.configuration.chap_password = 'secretsecret'
+        self.driver.do_setup(None)
+        with mock.patch.object(STXCommon,
+                               'create_chap_record') as mock_create:
+            self.assertEqual('secretsecret',
+                             self.driver.create_chap_record('iqn'))
+            mock_create.assert_called_once_with('iqn', 'secretsecret')
+
+    def test_initialize_iscsi_ports(self):
+        self.driver.iscsi_ips = ['10.0.0.11', '10.0.0.12:3261']
+        self.driver.initialize_iscsi_ports()
+        self.assertEqual((('10.0.0.11', '10.0.0.11:3260'),
+                          ('10.0.0.12', '10.0.0.12:3261')),
+                         self.driver.iscsi_ips)
+
+        for invalid in (['10.0.0.11:3260:1'], []):
+            self.driver.iscsi_ips = invalid
+            self.assertRaises(exception.InvalidInput,
+                              self.driver.initialize_iscsi_ports)
+
     @mock.patch.object(STXCommon, 'unmap_volume')
     def test_terminate_connection(self, mock_unmap):
         mock_unmap.side_effect = [exception.Invalid, 1]
@@ -836,3 +991,14 @@ class TestSeagateISCSI(TestSeagateFC):
 
         ret = self.driver.terminate_connection(test_volume, connector)
         self.assertIsNone(ret)
+
+    @mock.patch.object(STXCommon, 'unmap_volume')
+    def test_terminate_connection_mapping(self, mock_unmap):
+        ordered_connector = collections.OrderedDict(connector)
+        self.driver.terminate_connection(test_volume, ordered_connector)
+        mock_unmap.assert_called_once_with(test_volume, ordered_connector,
+                                           'initiator')
+
+        mock_unmap.reset_mock()
+        self.driver.terminate_connection(test_volume, None)
+        mock_unmap.assert_not_called()
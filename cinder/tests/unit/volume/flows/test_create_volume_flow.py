@@ -22,6 +22,7 @@ from castellan.common import exception as castellan_exc
 from castellan.tests.unit.key_manager import mock_key_manager
 import ddt
 from oslo_utils import imageutils
+from taskflow.types import failure as ft
 
 from cinder import context
 from cinder import exception
@@ -1068,29 +1069,143 @@ class CreateVolumeFlowManagerTestCase(test.TestCase):
         # Check if volume object is updated.
         self.assertTrue(vol_update.called)
 
+    def test_extract_cinder_ids(self):
+        urls = ['cinder://%s' % fakes.VOLUME_ID,
+                'cinder://fast-store/%s' % fakes.VOLUME2_ID,
+                'cinder://not-a-volume-id',
+                'cinder://%s\n' % fakes.VOLUME3_ID,
+                'rbd://fsid/pool/%s/snap' % fakes.VOLUME3_ID,
+                'http://example.com/%s' % fakes.VOLUME4_ID]
+
+        self.assertEqual(
+            [fakes.VOLUME_ID, fakes.VOLUME2_ID],
+            create_volume_manager.CreateVolumeFromSpecTask.
+            _extract_cinder_ids(urls))
+
+    @ddt.data(True, False)
+    def test_reschedule_exc_info(self, full_traceback):
+        self.override_config('reschedule_full_traceback', full_traceback)
+        scheduler_rpcapi = mock.Mock()
+        scheduler_rpcapi.create_volume.__name__ = 'create_volume'
+        task = create_volume_manager.OnFailureRescheduleTask(
+            mock.Mock(), mock.Mock(), mock.Mock(), scheduler_rpcapi, True)
+        volume = fake_volume.fake_volume_obj(self.ctxt)
+        filter_properties = {'retry': {}}
+        try:
+            raise exception.VolumeBackendAPIException(data='fake')
+        except exception.VolumeBackendAPIException:
+            cause = ft.Failure()
+
+        task._reschedule(self.ctxt, cause, {}, filter_properties, volume)
+
+        exc = ''.join(filter_properties['retry']['exc'])
+        self.assertIn('VolumeBackendAPIException', exc)
+        self.assertEqual(full_traceback, 'Traceback' in exc)
+        scheduler_rpcapi.create_volume.assert_called_once_with(
+            self.ctxt, volume, request_spec={'volume_id': volume.id},
+            filter_properties=filter_properties)
+
+    @mock.patch('cinder.volume.flows.manager.create_volume.'
+                'key_manager.API')
+    def test_key_mgr_created_once(self, mock_key_api):
+        fake_manager = create_volume_manager.CreateVolumeFromSpecTask(
+            mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        mock_key_api.reset_mock()
+
+        self.assertIs(mock_key_api.return_value, fake_manager.key_mgr)
+        self.assertIs(mock_key_api.return_value, fake_manager.key_mgr)
+        mock_key_api.assert_called_once_with(
+            create_volume_manager.CONF)
+
+    @ddt.data(('raw', '_create_raw_volume'),
+              ('snap', '_create_from_snapshot'),
+              ('source_vol', '_create_from_source_volume'),
+              ('image', '_create_from_image'))
+    @ddt.unpack
+    def test_execute_dispatch(self, create_type, method_name):
+        fake_manager = create_volume_manager.CreateVolumeFromSpecTask(
+            mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        volume = fake_volume.fake_volume_obj(self.ctxt)
+
+        with mock.patch.object(fake_manager, method_name,
+                               return_value=None) as mock_create:
+            fake_manager.execute(self.ctxt, volume,
+                                 {'type': create_type, 'foo': 'bar'})
+
+        mock_create.assert_called_once_with(self.ctxt, volume, foo='bar')
+
+    def test_execute_backup_dispatch(self):
+        fake_manager = create_volume_manager.CreateVolumeFromSpecTask(
+            mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        volume = fake_volume.fake_volume_obj(self.ctxt)
+
+        with mock.patch.object(fake_manager, '_create_from_backup',
+                               return_value=(None, False)):
+            spec = fake_manager.execute(
+                self.ctxt, volume,
+                {'type': 'backup', 'backup_id': fakes.BACKUP_ID})
+
+        self.assertFalse(spec['need_update_volume'])
+
+    def test_execute_unknown_type(self):
+        fake_manager = create_volume_manager.CreateVolumeFromSpecTask(
+            mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        volume = fake_volume.fake_volume_obj(self.ctxt)
+
+        self.assertRaises(exception.VolumeTypeNotFound,
+                          fake_manager.execute, self.ctxt, volume,
+                          {'type': 'unknown'})
+
+    @mock.patch('cinder.image.glance.get_remote_image_service')
+    def test_extract_volume_spec_image_meta_per_user(self,
+                                                     mock_get_service):
+        # Glance filters image metadata by the caller's roles, so it must
+        # be fetched for every request rather than shared between users.
+        image_service = mock.Mock()
+        image_service.show.side_effect = [{'id': fakes.IMAGE_ID,
+                                           'owner': 'user1-view'},
+                                          {'id': fakes.IMAGE_ID,
+                                           'owner': 'user2-view'}]
+        mock_get_service.return_value = (image_service, fakes.IMAGE_ID)
+        task = create_volume_manager.ExtractVolumeSpecTask(mock.MagicMock())
+        user1_ctxt = context.RequestContext(fakes.USER_ID, fakes.PROJECT_ID)
+        user2_ctxt = context.RequestContext(fakes.USER2_ID,
+                                            fakes.PROJECT_ID)
+
+        spec1 = task.execute(user1_ctxt, fake_volume.fake_volume_obj(
+            user1_ctxt), {'image_id': fakes.IMAGE_ID})
+        spec2 = task.execute(user2_ctxt, fake_volume.fake_volume_obj(
+            user2_ctxt), {'image_id': fakes.IMAGE_ID})
+
+        self.assertEqual('user1-view', spec1['image_meta']['owner'])
+        self.assertEqual('user2-view', spec2['image_meta']['owner'])
+        image_service.show.assert_has_calls(
+            [mock.call(user1_ctxt, fakes.IMAGE_ID),
+             mock.call(user2_ctxt, fakes.IMAGE_ID)])
+
     @mock.patch('cinder.volume.flows.manager.create_volume.'
                 'CreateVolumeFromSpecTask.'
                 '_cleanup_cg_in_volume')
     @mock.patch('cinder.volume.flows.manager.create_volume.'
                 'CreateVolumeFromSpecTask.'
                 '_handle_bootable_volume_glance_meta')
-    @mock.patch('cinder.objects.Volume.get_by_id')
     @mock.patch('cinder.objects.Snapshot.get_by_id')
-    def test_create_from_snapshot(self, snapshot_get_by_id, volume_get_by_id,
-                                  handle_bootable, cleanup_cg):
+    def test_create_from_snapshot(self, snapshot_get_by_id, handle_bootable,
+                                  cleanup_cg):
         fake_db = mock.MagicMock()
         fake_driver = mock.MagicMock()
         fake_volume_manager = mock.MagicMock()
         fake_manager = create_volume_manager.CreateVolumeFromSpecTask(
             fake_volume_manager, fake_db, fake_driver)
-        volume_db = {'bootable': True}
-        volume_obj = fake_volume.fake_volume_obj(self.ctxt, **volume_db)
+        volume_obj = fake_volume.fake_volume_obj(self.ctxt)
         snapshot_obj = fake_snapshot.fake_snapshot_obj(self.ctxt)
         snapshot_get_by_id.return_value = snapshot_obj
-        volume_get_by_id.return_value = volume_obj
+        fake_db.volume_bootable_get.return_value = True
 
         fake_manager._create_from_snapshot(self.ctxt, volume_obj,
                                            snapshot_obj.id)
+        fake_db.volume_bootable_get.assert_called_once_with(
+            self.ctxt, snapshot_obj.volume_id)
         fake_driver.create_volume_from_snapshot.assert_called_once_with(
             volume_obj, snapshot_obj)
         handle_bootable.assert_called_once_with(self.ctxt, volume_obj,
@@ -1111,7 +1226,7 @@ class CreateVolumeFlowManagerTestCase(test.TestCase):
         volume_obj = fake_volume.fake_volume_obj(self.ctxt)
         snapshot_obj = fake_snapshot.fake_snapshot_obj(self.ctxt)
         snapshot_get_by_id.return_value = snapshot_obj
-        fake_db.volume_get.side_effect = exception.CinderException
+        fake_db.volume_bootable_get.side_effect = exception.CinderException
 
         self.assertRaises(exception.MetadataUpdateFailure,
                           fake_manager._create_from_snapshot, self.ctxt,
@@ -1157,6 +1272,7 @@ class CreateVolumeFlowManagerTestCase(test.TestCase):
         image_meta['status'] = 'active'
         image_meta['size'] = 1
         image_location = 'abc'
+        self.flags(allowed_direct_url_schemes=['cinder'])
 
         fake_db.volume_update.return_value = volume
         fake_manager._create_from_image(self.ctxt, volume,
@@ -1166,6 +1282,8 @@ class CreateVolumeFlowManagerTestCase(test.TestCase):
         fake_driver.create_volume.assert_called_once_with(volume)
         fake_driver.copy_image_to_encrypted_volume.assert_called_once_with(
             self.ctxt, volume, fake_image_service, image_id)
+        fake_driver.clone_image.assert_not_called()
+        fake_db.volume_get_all_by_host.assert_not_called()
         mock_prepare_image_cache.assert_not_called()
         mock_handle_bootable.assert_called_once_with(self.ctxt, volume,
                                                      image_id=image_id,
@@ -1371,6 +1489,12 @@ class CreateVolumeFlowManagerGlanceCinderBackendCase(test.TestCase):
                                                     image_meta=image_meta)
         else:
             self.assertFalse(fake_driver.create_cloned_volume.called)
+        if format == 'raw' and location:
+            filters = {'id': [image_volume['id']]}
+            if owner:
+                filters['metadata'] = {'image_owner': owner}
+            fake_db.volume_get_all_by_host.assert_called_once_with(
+                self.ctxt, volume['host'], filters=filters)
         mock_cleanup_cg.assert_called_once_with(volume)
 
     @mock.patch('cinder.volume.flows.manager.create_volume.'
@@ -1447,6 +1571,53 @@ class CreateVolumeFlowManagerGlanceCinderBackendCase(test.TestCase):
     def test_create_from_image_volume_without_location(self):
         self.test_create_from_image_volume(location=False)
 
+    def test_clone_image_volume_without_cinder_location(self):
+        fake_db = mock.MagicMock()
+        fake_manager = create_volume_manager.CreateVolumeFromSpecTask(
+            mock.MagicMock(), fake_db, mock.MagicMock())
+        volume = fake_volume.fake_volume_obj(self.ctxt,
+                                             host='host@backend#pool')
+        url = 'rbd://fsid/pool/image/snap'
+        image_meta = {'id': fakes.IMAGE_ID,
+                      'container_format': 'bare',
+                      'disk_format': 'raw',
+                      'owner': self.ctxt.project_id}
+
+        result = fake_manager._clone_image_volume(
+            self.ctxt, volume, (url, [{'url': url, 'metadata': {}}]),
+            image_meta)
+
+        self.assertEqual((None, False), result)
+        fake_db.volume_get_all_by_host.assert_not_called()
+
+    def test_clone_image_volume_without_image_owner(self):
+        fake_db = mock.MagicMock()
+        fake_driver = mock.MagicMock()
+        fake_manager = create_volume_manager.CreateVolumeFromSpecTask(
+            mock.MagicMock(), fake_db, fake_driver)
+        volume = fake_volume.fake_volume_obj(self.ctxt,
+                                             host='host@backend#pool')
+        image_volume = fake_volume.fake_volume_obj(self.ctxt,
+                                                   volume_metadata={})
+        url = 'cinder://%s' % image_volume['id']
+        image_meta = {'id': fakes.IMAGE_ID,
+                      'container_format': 'bare',
+                      'disk_format': 'raw',
+                      'owner': None}
+        fake_db.volume_get_all_by_host.return_value = [image_volume]
+
+        with mock.patch.object(fake_manager, '_cleanup_cg_in_volume'):
+            result = fake_manager._clone_image_volume(
+                self.ctxt, volume, (url, [{'url': url, 'metadata': {}}]),
+                image_meta)
+
+        self.assertEqual((fake_driver.create_cloned_volume.return_value,
+                          True), result)
+        fake_db.volume_get_all_by_host.assert_called_once_with(
+            self.ctxt, volume['host'], filters={'id': [image_volume['id']]})
+        fake_driver.create_cloned_volume.assert_called_once_with(
+            volume, image_volume)
+
 
 @ddt.ddt
 @mock.patch('cinder.image.image_utils.TemporaryImages.fetch')
@@ -1844,6 +2015,10 @@ class CreateVolumeFlowManagerImageCacheTestCase(test.TestCase):
             _create_image_cache_volume_entry.assert_called_once_with(
                 self.ctxt, volume, image_id, image_meta))
 
+        # The miss seen before taking the lock and the one re-checked under
+        # it are the only cache lookups.
+        self.assertEqual(2, self.mock_cache.get_entry.call_count)
+
         mock_handle_bootable.assert_called_once_with(
             self.ctxt,
             volume,
@@ -1912,10 +2087,11 @@ class CreateVolumeFlowManagerImageCacheTestCase(test.TestCase):
         )
 
         # The volume size should be reduced to virtual_size and then put back,
-        # especially if there is an exception while creating the volume.
-        self.assertEqual(2, mock_volume_update.call_count)
-        mock_volume_update.assert_any_call(self.ctxt, volume.id, {'size': 2})
-        mock_volume_update.assert_any_call(self.ctxt, volume.id, {'size': 10})
+        # especially if there is an exception while creating the volume. The
+        # reduced size is only written along with the download's model
+        # update, so here only the original size gets saved.
+        mock_volume_update.assert_called_once_with(self.ctxt, volume.id,
+                                                   {'size': 10})
 
         # Make sure we didn't try and create a cache entry
         self.assertFalse(self.mock_cache.ensure_space.called)
@@ -2210,3 +2386,56 @@ class CreateVolumeFlowManagerImageCacheTestCase(test.TestCase):
                 image_meta,
                 self.mock_image_service,
                 update_cache=True)
+
+    @ddt.data(None, {'volume_id': fakes.VOLUME_ID})
+    @mock.patch('cinder.volume.flows.manager.create_volume.'
+                'CreateVolumeFromSpecTask.'
+                '_create_from_image_cache_or_download')
+    @mock.patch('cinder.volume.flows.manager.create_volume.'
+                'CreateVolumeFromSpecTask.'
+                '_prepare_image_cache_entry')
+    def test_create_from_image_cache_lookup_before_lock(
+            self,
+            mock_cache_entry,
+            mock_prepare_image_cache_entry,
+            mock_create_from_image_cache_or_download,
+            mock_get_internal_context,
+            mock_create_from_img_dl, mock_create_from_src,
+            mock_handle_bootable, mock_fetch_img):
+        self.mock_driver.clone_image.return_value = (None, False)
+        self.mock_cache.get_entry.return_value = mock_cache_entry
+        mock_prepare_image_cache_entry.return_value = (None, False)
+        volume = fake_volume.fake_volume_obj(self.ctxt,
+                                             host='host@backend#pool')
+        image_location = 'someImageLocationStr'
+        image_id = fakes.IMAGE_ID
+        image_meta = {'virtual_size': '1073741824', 'size': 1073741824}
+
+        manager = create_volume_manager.CreateVolumeFromSpecTask(
+            self.mock_volume_manager,
+            self.mock_db,
+            self.mock_driver,
+            image_volume_cache=self.mock_cache
+        )
+        manager._create_from_image(self.ctxt,
+                                   volume,
+                                   image_location,
+                                   image_id,
+                                   image_meta,
+                                   self.mock_image_service)
+
+        self.mock_cache.get_entry.assert_called_once_with(
+            mock_get_internal_context.return_value, volume, image_id,
+            image_meta)
+        if mock_cache_entry:
+            # Cache hit, so the image lock is never taken.
+            mock_prepare_image_cache_entry.assert_not_called()
+        else:
+            mock_prepare_image_cache_entry.assert_called_once_with(
+                self.ctxt, volume, image_location, image_id, image_meta,
+                self.mock_image_service)
+        # The entry found before taking the lock is passed on, so the
+        # cache is not queried again.
+        mock_create_from_image_cache_or_download.assert_called_once_with(
+            self.ctxt, volume, image_location, image_id, image_meta,
+            self.mock_image_service, cache_entry=mock_cache_entry)
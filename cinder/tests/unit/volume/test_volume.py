@@ -58,6 +58,7 @@ from cinder.volume import manager as vol_manager
 from cinder.volume import rpcapi as volume_rpcapi
 import cinder.volume.targets.tgt
 from cinder.volume import volume_types
+from cinder.volume import volume_utils
 
 
 QUOTAS = quota.QUOTAS
@@ -1698,14 +1699,16 @@ class VolumeTestCase(base.BaseVolumeTestCase):
     @mock.patch('cinder.volume.driver.VolumeDriver._detach_volume')
     @mock.patch('cinder.volume.driver.VolumeDriver._attach_volume')
     @mock.patch('cinder.volume.volume_utils.brick_get_connector_properties')
-    @mock.patch('cinder.utils.execute')
+    @mock.patch('cinder.privsep.cryptsetup.luks_format')
+    @mock.patch('cinder.privsep.cryptsetup.luks_change_key')
     def test_create_volume_from_volume_with_enc(
-            self, mock_execute, mock_brick_gcp, mock_at, mock_det,
-            mock_qemu_img_info, mock_enc_metadata_get, mock_setup_enc_keys,
-            mock_del_enc_key, connector_class=None, rekey_supported=None,
-            already_encrypted=None):
+            self, mock_change_key, mock_format, mock_brick_gcp, mock_at,
+            mock_det, mock_qemu_img_info, mock_enc_metadata_get,
+            mock_setup_enc_keys, mock_del_enc_key, connector_class=None,
+            rekey_supported=None, already_encrypted=None):
+        # Rekeying caches the mocked connector properties
+        self.addCleanup(volume_utils.clear_connector_properties_cache)
         # create source volume
-        mock_execute.return_value = ('', '')
         mock_enc_metadata_get.return_value = {'cipher': 'aes-xts-plain64',
                                               'key_size': 256,
                                               'provider': 'luks'}
@@ -1760,31 +1763,25 @@ class VolumeTestCase(base.BaseVolumeTestCase):
                 src_vol,
                 {'key_size': 256,
                  'provider': 'luks',
-                 'cipher': 'aes-xts-plain64'}
+                 'cipher': 'aes-xts-plain64'},
+                keymgr=mock.ANY
             )
             if already_encrypted:
-                mock_execute.assert_called_once_with(
-                    'cryptsetup', 'luksChangeKey',
-                    '/some/device/thing',
-                    '--force-password',
-                    log_errors=processutils.LOG_ALL_ERRORS,
-                    process_input='qwert\nasdfg\n',
-                    run_as_root=True)
-
+                mock_change_key.assert_called_once_with(
+                    '/some/device/thing', 'qwert\nasdfg\n')
+                mock_format.assert_not_called()
             else:
-                mock_execute.assert_called_once_with(
-                    'cryptsetup', '--batch-mode', 'luksFormat',
-                    '--type', 'luks1',
-                    '--cipher', 'aes-xts-plain64', '--key-size', '256',
-                    '--key-file=-', '/some/device/thing',
-                    process_input='asdfg',
-                    run_as_root=True)
+                mock_format.assert_called_once_with(
+                    '/some/device/thing', 'luks1', 'aes-xts-plain64', 256,
+                    'asdfg')
+                mock_change_key.assert_not_called()
             mock_del_enc_key.assert_called_once_with(mock.ANY,  # context
                                                      mock.ANY,  # keymgr
                                                      fake.ENCRYPTION_KEY2_ID)
         else:
             mock_setup_enc_keys.assert_not_called()
-            mock_execute.assert_not_called()
+            mock_change_key.assert_not_called()
+            mock_format.assert_not_called()
             mock_del_enc_key.assert_not_called()
         mock_at.assert_called()
         mock_det.assert_called()
@@ -20,6 +20,7 @@ import random
 import sys
 import time
 
+import eventlet
 from oslo_config import cfg
 from oslo_config import types
 from oslo_log import log as logging
@@ -53,6 +54,10 @@ REPLICATION_ENABLED = fields.ReplicationStatus.ENABLED
 REPLICATION_FAILOVER = fields.ReplicationStatus.FAILED_OVER
 FAILOVER_ERROR = fields.ReplicationStatus.FAILOVER_ERROR
 REPLICATION_ERROR = fields.ReplicationStatus.ERROR
+# Maximum number of replication groups failed over at the same time
+FAILOVER_GROUP_CONCURRENCY = 4
+# Maximum number of group member volumes deleted at the same time
+GROUP_VOLUME_CONCURRENCY = 16
 
 retry_exc_tuple = (exception.VolumeBackendAPIException,)
 
@@ -988,6 +993,16 @@ class PowerMaxCommon(object):
                     self._find_ip_and_iqns(
                         rep_extra_specs[utils.ARRAY], remote_port_group))
             device_info_dict['is_multipath'] = is_multipath
+        else:
+            # Save the FC driver looking up the masking view again to find
+            # the port group and target WWNs
+            device_info_dict['portgroup'] = port_group_name
+            device_info_dict['target_wwns'] = self.rest.get_target_wwns(
+                extra_specs[utils.ARRAY], port_group_name)
+            if self.utils.is_metro_device(rep_config, extra_specs):
+                device_info_dict['metro_target_wwns'] = (
+                    self.rest.get_target_wwns(
+                        rep_extra_specs[utils.ARRAY], remote_port_group))
 
         array_tag_list = self.get_tags_of_storage_array(
             extra_specs[utils.ARRAY])
@@ -1717,6 +1732,31 @@ class PowerMaxCommon(object):
             is_metro = True
         return mv_list, is_metro
 
+    def get_masking_views_from_volume_for_hosts(
+            self, array, volume, device_id, hosts):
+        """Get the masking views from a volume for the first matching host.
+
+        The masking views of the volume are retrieved once and then checked
+        against each host in turn.
+
+        :param array: array serial number
+        :param volume: the volume object
+        :param device_id: the volume device id
+        :param hosts: the hosts, in order of preference -- list
+        :returns: masking view list, is metro, host
+        """
+        extra_specs = self._initial_setup(volume)
+        is_metro = self.utils.is_metro_device(
+            extra_specs.get(utils.REP_CONFIG), extra_specs)
+        mvs, __ = self._get_mvs_and_sgs_from_volume(array, device_id)
+        mv_list, host = [], None
+        for host in hosts:
+            mv_list, __ = self._get_masking_views_from_volume_for_host(
+                mvs, host)
+            if mv_list:
+                break
+        return mv_list, is_metro, host
+
     def _get_masking_views_from_volume(self, array, device_id, host):
         """Helper function to retrieve masking view list for a volume.
 
@@ -5400,18 +5440,24 @@ class PowerMaxCommon(object):
             else:
                 non_rep_vol_list.append(volume)
 
+        # Each RDF group is failed over through its own storage group, so
+        # the groups are processed concurrently in a bounded pool.
         if len(sync_vol_dict) > 0:
-            for key, sync_vol_list in sync_vol_dict.items():
-                vol_updates = (
-                    self._update_volume_list_from_sync_vol_list(
-                        sync_vol_list, group_fo))
+            for vol_updates in self._run_concurrently(
+                    lambda sync_vol_list: (
+                        self._update_volume_list_from_sync_vol_list(
+                            sync_vol_list, group_fo)),
+                    sync_vol_dict.values(),
+                    concurrency=FAILOVER_GROUP_CONCURRENCY):
                 volume_update_list += vol_updates
 
         if len(async_vol_dict) > 0:
-            for vol_grp_name, async_vol_list in async_vol_dict.items():
-                __, vol_updates = self._failover_replication(
-                    async_vol_list, None, vol_grp_name,
-                    secondary_backend_id=group_fo, host=True)
+            for __, vol_updates in self._run_concurrently(
+                    lambda vol_grp_name: self._failover_replication(
+                        async_vol_dict[vol_grp_name], None, vol_grp_name,
+                        secondary_backend_id=group_fo, host=True),
+                    async_vol_dict,
+                    concurrency=FAILOVER_GROUP_CONCURRENCY):
                 volume_update_list += vol_updates
 
         if len(metro_vol_list) > 0:
@@ -5741,7 +5787,7 @@ class PowerMaxCommon(object):
         try:
             if volume_device_ids:
 
-                def _delete_vol(dev_id):
+                def _delete_vol(dev_id, vol, extra_specs):
                     if group.is_replicated:
                         # Set flag to True if replicated.
                         extra_specs[utils.FORCE_VOL_EDIT] = True
@@ -5753,23 +5799,32 @@ class PowerMaxCommon(object):
                             array, dev_id, "group vol", extra_specs)
                     else:
                         LOG.debug("Volume not found on the array.")
-                    # Add the device id to the deleted list
-                    deleted_volume_device_ids.append(dev_id)
+                    return dev_id
+
+                def _delete_group_vol(vol):
+                    vol_extra_specs = self._initial_setup(vol)
+                    device_id = self._find_device_on_array(
+                        vol, vol_extra_specs)
+                    if device_id:
+                        return _delete_vol(device_id, vol, vol_extra_specs)
 
                 # First remove all the volumes from the SG
                 self.masking.remove_volumes_from_storage_group(
                     array, volume_device_ids, vol_grp_name,
                     interval_retries_dict)
-                for vol in volumes:
-                    extra_specs = self._initial_setup(vol)
-                    device_id = self._find_device_on_array(vol, extra_specs)
+                # Add the device ids to the deleted list as the deletes
+                # complete; the ones done before a failure are still
+                # recorded for the exception handling below.
+                for device_id in self._run_concurrently(_delete_group_vol,
+                                                        volumes):
                     if device_id:
-                        _delete_vol(device_id)
+                        deleted_volume_device_ids.append(device_id)
                 if volume_device_ids != deleted_volume_device_ids:
                     new_list = list(set(volume_device_ids).difference(
                         deleted_volume_device_ids))
                     for device_id in new_list:
-                        _delete_vol(device_id)
+                        deleted_volume_device_ids.append(
+                            _delete_vol(device_id, vol, extra_specs))
 
             # Once all volumes are deleted then delete the SG
             self.rest.delete_storage_group(array, vol_grp_name)
@@ -6382,6 +6437,53 @@ class PowerMaxCommon(object):
 
         return model_update, volumes_model_update
 
+    @staticmethod
+    def _run_concurrently(func, items, concurrency=None):
+        """Call func on each item using a bounded green thread pool.
+
+        Once a call has failed no further calls are started. The calls
+        already running are waited for and the results of the successful
+        ones are yielded, in the order of items, before the first error is
+        re-raised, so callers can record what was done before rolling back
+        and never roll back under in-flight requests.
+
+        :param func: the function to call with each item
+        :param items: the items to process
+        :param concurrency: the maximum number of concurrent calls,
+                            GROUP_VOLUME_CONCURRENCY by default
+        :returns: generator -- the results of the successful calls
+        """
+        pool = eventlet.GreenPool(concurrency or GROUP_VOLUME_CONCURRENCY)
+        failures = list()
+
+        def _call(item):
+            # A failure may have happened while this call waited for a
+            # free slot in the pool.
+            if failures:
+                return False, None
+            try:
+                return True, func(item)
+            except Exception as e:
+                failures.append(e)
+                raise
+
+        threads = list()
+        for item in items:
+            if failures:
+                break
+            threads.append(pool.spawn(_call, item))
+        pool.waitall()
+
+        for thread in threads:
+            try:
+                called, result = thread.wait()
+            except Exception:
+                continue
+            if called:
+                yield result
+        if failures:
+            raise failures[0]
+
     def _add_replicated_volumes_to_default_storage_group(
             self, array, volumes_model_update, extra_specs):
         """Add replicated volumes to the default storage group.
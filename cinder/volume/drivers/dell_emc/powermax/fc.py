@@ -14,7 +14,9 @@
 #    under the License.
 
 import ast
+import functools
 
+import eventlet
 from oslo_log import log as logging
 
 from cinder import exception
@@ -27,6 +29,19 @@ from cinder.zonemanager import utils as fczm_utils
 LOG = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=1024)
+def _parse_location(location):
+    """Parse a provider location or replication driver data string.
+
+    The result is cached as the same string is parsed on every attach and
+    detach of a volume, callers must not modify the returned dict.
+
+    :param location: the location string
+    :returns: dict -- the parsed location
+    """
+    return ast.literal_eval(location)
+
+
 @interface.volumedriver
 class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
     """FC Drivers for PowerMax using REST.
@@ -147,6 +162,8 @@ class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
             configuration=self.configuration,
             active_backend_id=self.active_backend_id)
         self.performance = self.common.performance
+        # The performance configuration is only set when common is created
+        self.load_balance = self.performance.config.get('load_balance', False)
         self.rest = self.common.rest
         self.zonemanager_lookup_service = fczm_utils.create_lookup_service()
 
@@ -285,12 +302,11 @@ class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
         """
         device_info = self.common.initialize_connection(
             volume, connector)
-        if device_info:
-            conn_info = self.populate_data(device_info, volume, connector)
-            fczm_utils.add_fc_zone(conn_info)
-            return conn_info
-        else:
+        if not device_info:
             return {}
+        conn_info = self.populate_data(device_info, volume, connector)
+        fczm_utils.add_fc_zone(conn_info)
+        return conn_info
 
     def populate_data(self, device_info, volume, connector):
         """Populate data dict.
@@ -312,8 +328,9 @@ class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
                          'target_wwn': target_wwns,
                          'initiator_target_map': init_targ_map}}
 
-        LOG.debug("Return FC data for zone addition: %(data)s.",
-                  {'data': data})
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug("Return FC data for zone addition: %(data)s.",
+                      {'data': data})
 
         return data
 
@@ -349,10 +366,13 @@ class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
         :returns: dict -- the target_wwns and initiator_target_map if the
             zone is to be removed, otherwise empty
         """
-        loc = volume.provider_location
-        name = ast.literal_eval(loc)
-        host_label = self.common.utils.get_host_name_label(
-            connector['host'], self.common.powermax_short_host_name_template)
+        name = _parse_location(volume.provider_location)
+        host_labels = [
+            self.common.utils.get_host_name_label(
+                connector['host'],
+                self.common.powermax_short_host_name_template),
+            # Backward compatibility with pre Ussuri short host name.
+            self.common.utils.get_host_short_name(connector['host'])]
         zoning_mappings = {}
         try:
             array = name['array']
@@ -360,42 +380,16 @@ class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
         except KeyError:
             array = name['keybindings']['SystemName'].split('+')[1].strip('-')
             device_id = name['keybindings']['DeviceID']
-        LOG.debug("Start FC detach process for volume: %(volume)s.",
-                  {'volume': volume.name})
-
-        masking_views, is_metro = (
-            self.common.get_masking_views_from_volume(
-                array, volume, device_id, host_label))
-        if not masking_views:
-            # Backward compatibility with pre Ussuri short host name.
-            host_label = self.common.utils.get_host_short_name(
-                connector['host'])
-            masking_views, is_metro = (
-                self.common.get_masking_views_from_volume(
-                    array, volume, device_id, host_label))
-        if masking_views:
-            portgroup = (
-                self.common.get_port_group_from_masking_view(
-                    array, masking_views[0]))
-            initiator_group = (
-                self.common.get_initiator_group_from_masking_view(
-                    array, masking_views[0]))
-
-            LOG.debug("Found port group: %(portGroup)s "
-                      "in masking view %(maskingView)s.",
-                      {'portGroup': portgroup,
-                       'maskingView': masking_views[0]})
-            # Map must be populated before the terminate_connection
-            target_wwns, init_targ_map = self._build_initiator_target_map(
-                volume, connector)
-            zoning_mappings = {'port_group': portgroup,
-                               'initiator_group': initiator_group,
-                               'target_wwns': target_wwns,
-                               'init_targ_map': init_targ_map,
-                               'array': array}
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug("Start FC detach process for volume: %(volume)s.",
+                      {'volume': volume.name})
+
+        masking_views, is_metro, host_label = (
+            self.common.get_masking_views_from_volume_for_hosts(
+                array, volume, device_id, host_labels))
+        metro_thread = None
         if is_metro:
-            rep_data = volume.replication_driver_data
-            name = ast.literal_eval(rep_data)
+            name = _parse_location(volume.replication_driver_data)
             try:
                 metro_array = name['array']
                 metro_device_id = name['device_id']
@@ -404,24 +398,81 @@ class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
                           "for zone cleanup. Attempting terminate "
                           "connection...")
             else:
-                masking_views, __ = (
-                    self.common.get_masking_views_from_volume(
-                        metro_array, volume, metro_device_id, host_label))
-                if masking_views:
-                    metro_portgroup = (
-                        self.common.get_port_group_from_masking_view(
-                            metro_array, masking_views[0]))
-                    metro_ig = (
-                        self.common.get_initiator_group_from_masking_view(
-                            metro_array, masking_views[0]))
-                    zoning_mappings.update(
-                        {'metro_port_group': metro_portgroup,
-                         'metro_ig': metro_ig, 'metro_array': metro_array})
+                # The remote lookups do not depend on the local ones, run
+                # them concurrently to overlap the REST round-trips.
+                metro_thread = eventlet.spawn(
+                    self._get_metro_zoning_mappings, metro_array, volume,
+                    metro_device_id, host_label)
+        if masking_views:
+            try:
+                portgroup, initiator_group = self._get_masking_view_groups(
+                    array, masking_views[0])
+
+                if LOG.isEnabledFor(logging.DEBUG):
+                    LOG.debug("Found port group: %(portGroup)s "
+                              "in masking view %(maskingView)s.",
+                              {'portGroup': portgroup,
+                               'maskingView': masking_views[0]})
+                # Map must be populated before the terminate_connection
+                target_wwns, init_targ_map = (
+                    self._build_initiator_target_map(volume, connector))
+            except Exception:
+                # Do not leave the remote lookups running on failure.
+                if metro_thread:
+                    metro_thread.kill()
+                raise
+            zoning_mappings = {'port_group': portgroup,
+                               'initiator_group': initiator_group,
+                               'target_wwns': target_wwns,
+                               'init_targ_map': init_targ_map,
+                               'array': array}
+        if metro_thread:
+            masking_views, metro_mappings = metro_thread.wait()
+            zoning_mappings.update(metro_mappings)
         if not masking_views:
             LOG.warning("Volume %(volume)s is not in any masking view.",
                         {'volume': volume.name})
         return zoning_mappings
 
+    def _get_metro_zoning_mappings(
+            self, metro_array, volume, metro_device_id, host_label):
+        """Get the zoning mappings of the remote Metro device.
+
+        :param metro_array: the remote array serial number
+        :param volume: the volume object
+        :param metro_device_id: the remote device id
+        :param host_label: the host label
+        :returns: masking views -- list, metro zoning mappings -- dict
+        """
+        metro_mappings = {}
+        masking_views, __ = (
+            self.common.get_masking_views_from_volume(
+                metro_array, volume, metro_device_id, host_label))
+        if masking_views:
+            metro_portgroup, metro_ig = self._get_masking_view_groups(
+                metro_array, masking_views[0])
+            metro_mappings = {'metro_port_group': metro_portgroup,
+                              'metro_ig': metro_ig,
+                              'metro_array': metro_array}
+        return masking_views, metro_mappings
+
+    def _get_masking_view_groups(self, array, masking_view):
+        """Get the port group and initiator group of a masking view.
+
+        Both lookups are issued concurrently.
+
+        :param array: the array serial number
+        :param masking_view: the masking view name
+        :returns: port group name, initiator group name
+        """
+        pile = eventlet.GreenPile(2)
+        pile.spawn(self.common.get_port_group_from_masking_view,
+                   array, masking_view)
+        pile.spawn(self.common.get_initiator_group_from_masking_view,
+                   array, masking_view)
+        portgroup, initiator_group = pile
+        return portgroup, initiator_group
+
     def _cleanup_zones(self, zoning_mappings):
         """Cleanup zones after terminate connection.
 
@@ -439,8 +490,9 @@ class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
             masking_views = []
 
         if masking_views:
-            LOG.debug("Found %(numViews)d MaskingViews.",
-                      {'numViews': len(masking_views)})
+            if LOG.isEnabledFor(logging.DEBUG):
+                LOG.debug("Found %(numViews)d MaskingViews.",
+                          {'numViews': len(masking_views)})
         else:  # no masking views found
             # Check if there any Metro masking views
             if zoning_mappings.get('metro_array'):
@@ -455,8 +507,9 @@ class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
                                  'initiator_target_map':
                                      zoning_mappings['init_targ_map']}}
 
-                LOG.debug("Return FC data for zone removal: %(data)s.",
-                          {'data': data})
+                if LOG.isEnabledFor(logging.DEBUG):
+                    LOG.debug("Return FC data for zone removal: %(data)s.",
+                              {'data': data})
 
         return data
 
@@ -468,24 +521,32 @@ class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
         :param device_info: device_info
         :returns: target_wwns -- list, init_targ_map -- dict
         """
-        target_wwns, init_targ_map = [], {}
+        # Dict keys dedupe the target WWNs while keeping a stable order
+        target_wwns, init_targ_map = {}, {}
         initiator_wwns = connector['wwpns']
-        fc_targets, metro_fc_targets = (
-            self.common.get_target_wwns_from_masking_view(
-                volume, connector))
+        if device_info and 'target_wwns' in device_info:
+            # Already retrieved by common on initialize connection
+            fc_targets = device_info['target_wwns']
+            metro_fc_targets = device_info.get('metro_target_wwns', [])
+        else:
+            fc_targets, metro_fc_targets = (
+                self.common.get_target_wwns_from_masking_view(
+                    volume, connector))
 
         # If load balance is enabled we want to select only the FC target that
         # has the lowest load of all ports in selected port group.
         # Note: device_info in if condition as this method is called also for
         # terminate connection, we only want to calculate load on initialise
         # connection.
-        if device_info and self.performance.config.get('load_balance'):
+        if device_info and self.load_balance:
             try:
                 array_id = device_info.get('array')
-                masking_view = device_info.get('maskingview')
-                # Get PG from MV
-                port_group = self.rest.get_element_from_masking_view(
-                    array_id, masking_view, portgroup=True)
+                # Get PG from device info, falling back to the MV lookup
+                port_group = device_info.get('portgroup')
+                if not port_group:
+                    port_group = self.rest.get_element_from_masking_view(
+                        array_id, device_info.get('maskingview'),
+                        portgroup=True)
                 # Get port list from PG
                 port_list = self.rest.get_port_ids(array_id, port_group)
                 # Get lowest load port in PG
@@ -502,29 +563,31 @@ class PowerMaxFCDriver(san.SanDriver, driver.FibreChannelDriver):
                 # Set lowest load port WWN as FC target for connection
                 fc_targets = [port_wwn]
             except exception.VolumeBackendAPIException:
+                # The default targets were already retrieved above, there is
+                # no need to query the masking view for them again.
                 LOG.error("There was an error calculating port load, "
                           "reverting to default target selection.")
-                fc_targets, __ = (
-                    self.common.get_target_wwns_from_masking_view(
-                        volume, connector))
 
+        # Build a new list rather than extending the one returned by common
+        fc_targets = fc_targets + metro_fc_targets
         if self.zonemanager_lookup_service:
-            fc_targets.extend(metro_fc_targets)
             mapping = (
                 self.zonemanager_lookup_service.
                 get_device_mapping_from_network(initiator_wwns, fc_targets))
-            for entry in mapping:
-                map_d = mapping[entry]
-                target_wwns.extend(map_d['target_port_wwn_list'])
-                for initiator in map_d['initiator_port_wwn_list']:
-                    init_targ_map[initiator] = map_d['target_port_wwn_list']
+            fabric_target_lists = {}
+            for map_d in mapping.values():
+                # Initiators share one list object per distinct target list
+                fabric_targets = fabric_target_lists.setdefault(
+                    tuple(map_d['target_port_wwn_list']),
+                    map_d['target_port_wwn_list'])
+                target_wwns.update(dict.fromkeys(fabric_targets))
+                init_targ_map.update(dict.fromkeys(
+                    map_d['initiator_port_wwn_list'], fabric_targets))
         else:  # No lookup service, pre-zoned case.
-            target_wwns = fc_targets
-            fc_targets.extend(metro_fc_targets)
-            for initiator in initiator_wwns:
-                init_targ_map[initiator] = fc_targets
+            target_wwns.update(dict.fromkeys(fc_targets))
+            init_targ_map = dict.fromkeys(initiator_wwns, fc_targets)
 
-        return list(set(target_wwns)), init_targ_map
+        return list(target_wwns), init_targ_map
 
     def extend_volume(self, volume, new_size):
         """Extend an existing volume.
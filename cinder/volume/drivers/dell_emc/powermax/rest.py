@@ -52,6 +52,10 @@ STATUS_202 = 202
 STATUS_204 = 204
 SERVER_ERROR_STATUS_CODES = [408, 501, 502, 503, 504]
 ITERATOR_EXPIRATION = 180
+MASKING_VIEW_CACHE_EXPIRATION = 300
+MASKING_VIEW_CACHE_SIZE = 1024
+# Keep-alive connections held per Unisphere host, sized for group fan-out
+HTTP_POOL_SIZE = 32
 # Job constants
 INCOMPLETE_LIST = ['created', 'unscheduled', 'scheduled', 'running',
                    'validating', 'validated']
@@ -85,6 +89,9 @@ class PowerMaxRest(object):
         self.ucode_major_level = None
         self.ucode_minor_level = None
         self.is_snap_id = False
+        # The groups of a masking view cannot change during its lifetime.
+        # Bounded to MASKING_VIEW_CACHE_SIZE entries.
+        self.masking_view_cache = dict()
 
     def set_rest_credentials(self, array_info):
         """Given the array record set the rest server credentials.
@@ -155,9 +162,13 @@ class PowerMaxRest(object):
                 total=self.u4p_failover_retries,
                 backoff_factor=self.u4p_failover_backoff_factor,
                 status_forcelist=SERVER_ERROR_STATUS_CODES)
-            adapter = MyHTTPAdapter(max_retries=retry)
-            session.mount('https://', adapter)
-            session.mount('http://', adapter)
+            adapter = MyHTTPAdapter(max_retries=retry,
+                                    pool_maxsize=HTTP_POOL_SIZE)
+        else:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_maxsize=HTTP_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
 
         return session
 
@@ -1958,7 +1969,8 @@ class PowerMaxRest(object):
         :raises: VolumeBackendAPIException
         """
         element = None
-        masking_view_details = self.get_masking_view(array, maskingview_name)
+        masking_view_details = self._get_cached_masking_view(
+            array, maskingview_name)
         if masking_view_details:
             if portgroup:
                 element = masking_view_details['portGroupId']
@@ -1973,6 +1985,35 @@ class PowerMaxRest(object):
                 message=exception_message)
         return element
 
+    def _get_cached_masking_view(self, array, maskingview_name):
+        """Get the details of a masking view, cached for a short time.
+
+        :param array: the array serial number
+        :param maskingview_name: the masking view name
+        :returns: masking view dict
+        """
+        key = (array, maskingview_name)
+        cached = self.masking_view_cache.get(key)
+        if cached and (time.time() - cached[0]
+                       < MASKING_VIEW_CACHE_EXPIRATION):
+            return cached[1]
+        masking_view_details = self.get_masking_view(array, maskingview_name)
+        if masking_view_details:
+            now = time.time()
+            # Entries are kept in insertion order, oldest first, so expired
+            # entries are dropped, and the oldest ones evicted when the
+            # cache is full, before the new entry is added.
+            self.masking_view_cache.pop(key, None)
+            for cached_key, (cached_time, __) in list(
+                    self.masking_view_cache.items()):
+                if (len(self.masking_view_cache) < MASKING_VIEW_CACHE_SIZE
+                        and now - cached_time
+                        < MASKING_VIEW_CACHE_EXPIRATION):
+                    break
+                del self.masking_view_cache[cached_key]
+            self.masking_view_cache[key] = (now, masking_view_details)
+        return masking_view_details
+
     def get_common_masking_views(self, array, portgroup_name, ig_name):
         """Get common masking views for a given portgroup and initiator group.
 
@@ -2024,6 +2065,7 @@ class PowerMaxRest(object):
         :param array: the array serial number
         :param maskingview_name: the masking view name
         """
+        self.masking_view_cache.pop((array, maskingview_name), None)
         return self.delete_resource(
             array, SLOPROVISIONING, 'maskingview', maskingview_name)
 
@@ -15,6 +15,7 @@
 
 from copy import deepcopy
 import datetime
+import functools
 import re
 
 from oslo_log import log as logging
@@ -47,6 +48,7 @@ UCODE_5978_HICKORY = 660
 UCODE_5978 = 5978
 UPPER_HOST_CHARS = 16
 UPPER_PORT_GROUP_CHARS = 12
+HOST_NAME_CACHE_SIZE = 4096
 
 ARRAY = 'array'
 REMOTE_ARRAY = 'remote_array'
@@ -236,9 +238,22 @@ class PowerMaxUtils(object):
         :param host_name: the fully qualified host name
         :returns: string -- the short host_name
         """
-        short_host_name = self.get_host_short_name_from_fqn(host_name)
+        return self._get_cached_host_short_name(host_name)
 
-        return self.generate_unique_trunc_host(short_host_name)
+    @staticmethod
+    @functools.lru_cache(maxsize=HOST_NAME_CACHE_SIZE)
+    def _get_cached_host_short_name(host_name):
+        """Returns the short name for a given qualified host name, cached.
+
+        The cache is keyed on the host name only, so it is shared by all
+        backends.
+        :param host_name: the fully qualified host name
+        :returns: string -- the short host_name
+        """
+        short_host_name = PowerMaxUtils.get_host_short_name_from_fqn(
+            host_name)
+
+        return PowerMaxUtils.generate_unique_trunc_host(short_host_name)
 
     @staticmethod
     def get_host_short_name_from_fqn(host_name):
@@ -397,18 +412,20 @@ class PowerMaxUtils(object):
 
         return new_snap_name
 
-    def generate_unique_trunc_host(self, host_name):
+    @staticmethod
+    def generate_unique_trunc_host(host_name):
         """Create a unique short host name under 16 characters.
 
         :param host_name: long host name
         :returns: truncated host name
         """
         if host_name and len(host_name) > UPPER_HOST_CHARS:
-            uuid = self.get_uuid_of_input(host_name)
+            uuid = PowerMaxUtils.get_uuid_of_input(host_name)
             new_name = ("%(host)s%(uuid)s"
                         % {'host': host_name[-6:],
                            'uuid': uuid})
-            host_name = self.truncate_string(new_name, UPPER_HOST_CHARS)
+            host_name = PowerMaxUtils.truncate_string(
+                new_name, UPPER_HOST_CHARS)
         return host_name
 
     def get_pg_short_name(self, portgroup_name):
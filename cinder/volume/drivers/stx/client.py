@@ -18,6 +18,7 @@
 import hashlib
 import math
 import re
+import threading
 import time
 
 from lxml import etree
@@ -34,6 +35,14 @@ from cinder.volume import volume_utils
 
 LOG = logging.getLogger(__name__)
 
+# Return codes meaning the volume or snapshot does not exist on the array,
+# which can occur during controller failover. _assert_response_ok raises
+# VolumeNotFoundError for both, and the delete and unmap calls below log
+# and ignore it, so their callers never see it:
+# -10050 => The volume was not found on this system.
+# -10075 => The specified volume was not found.
+VOLUME_NOT_FOUND_CODES = ('-10050', '-10075')
+
 
 @six.add_metaclass(volume_utils.TraceWrapperMetaclass)
 class STXClient(object):
@@ -43,6 +52,7 @@ class STXClient(object):
         self._password = password
         self._protocol = protocol
         self._session_key = None
+        self._login_lock = threading.Lock()
         self.ssl_verify = ssl_verify
         self._set_host(self._mgmt_ip_addrs[0])
         self._fw_type = ''
@@ -50,6 +60,9 @@ class STXClient(object):
         self._driver_name = self.__class__.__name__.split('.')[0]
         self._array_name = 'unknown'
         self._luns_in_use_by_host = {}
+        # Requests are serialized by the array lock in _api_request, so
+        # the session's default connection pool is enough.
+        self._http = requests.Session()
 
     def _set_host(self, ip_addr):
         self._curr_ip_addr = ip_addr
@@ -71,8 +84,28 @@ class STXClient(object):
             raise stx_exception.ConnectionError(message=msg)
 
     def login(self):
+        # Concurrent requests that find no session wait for a single
+        # login instead of each authenticating with the array.
         if self._session_key is None:
-            return self.session_login()
+            with self._login_lock:
+                if self._session_key is None:
+                    return self._session_login()
+
+    def _session_login(self):
+        """Authenticates the service, raising user-facing errors."""
+        try:
+            self.session_login()
+        except stx_exception.ConnectionError as ex:
+            msg = _("Failed to connect to Array %(host)s: "
+                    "%(err)s") % {'host': ','.join(self._mgmt_ip_addrs),
+                                  'err': six.text_type(ex)}
+            LOG.error(msg)
+            raise stx_exception.ConnectionError(message=msg)
+        except stx_exception.AuthenticationError:
+            msg = _("Failed to log on Array %s "
+                    "(invalid login?).") % ','.join(self._mgmt_ip_addrs)
+            LOG.error(msg)
+            raise stx_exception.AuthenticationError(message=msg)
 
     def session_login(self):
         """Authenticates the service on the device.
@@ -127,10 +160,10 @@ class STXClient(object):
         url = self._base_url + "/login/" + digest
         try:
             if self._protocol == 'https':
-                xml = requests.get(url, verify=self.ssl_verify, timeout=30,
-                                   auth=(self._login, self._password))
+                xml = self._http.get(url, verify=self.ssl_verify, timeout=30,
+                                     auth=(self._login, self._password))
             else:
-                xml = requests.get(url, verify=self.ssl_verify, timeout=30)
+                xml = self._http.get(url, verify=self.ssl_verify, timeout=30)
         except requests.exceptions.RequestException:
             msg = _("Failed to obtain MC session key")
             LOG.exception(msg)
@@ -161,6 +194,8 @@ class STXClient(object):
         msg = "%s (%s)" % (tree.findtext(".//PROPERTY[@name='response']"),
                            return_code)
 
+        if return_code in VOLUME_NOT_FOUND_CODES:
+            raise stx_exception.VolumeNotFoundError(message=msg)
         raise stx_exception.RequestError(message=msg)
 
     def _build_request_url(self, path, *args, **kargs):
@@ -184,7 +219,11 @@ class STXClient(object):
         in the exception message.
 
         If the status is OK, returns the XML data for further processing.
+
+        The session key is kept for the lifetime of the client and is only
+        (re)acquired when missing or rejected by the array.
         """
+        self.login()
         tries_left = 2
         while tries_left > 0:
             try:
@@ -209,7 +248,7 @@ class STXClient(object):
                     raise
 
             tries_left -= 1
-            self.session_login()
+            self._session_login()
 
     @coordination.synchronized('{self._driver_name}-{self._array_name}')
     def _api_request(self, path, *args, **kargs):
@@ -226,8 +265,8 @@ class STXClient(object):
                   path, args, strutils.mask_password(kargs), self._session_key)
         headers = {'dataType': 'api', 'sessionKey': self._session_key}
         try:
-            xml = requests.get(url, headers=headers,
-                               verify=self.ssl_verify, timeout=60)
+            xml = self._http.get(url, headers=headers,
+                                 verify=self.ssl_verify, timeout=60)
             tree = etree.XML(xml.text.encode('utf8'))
         except Exception as e:
             message = _("Exception handling URL %(url)s: %(msg)s") % {
@@ -245,7 +284,7 @@ class STXClient(object):
     def session_logout(self):
         url = self._base_url + '/exit'
         try:
-            requests.get(url, verify=self.ssl_verify, timeout=30)
+            self._http.get(url, verify=self.ssl_verify, timeout=30)
             return True
         except Exception:
             return False
@@ -288,15 +327,11 @@ class STXClient(object):
     def delete_volume(self, name):
         try:
             self._request("/delete/volumes", name)
-        except stx_exception.RequestError as e:
-            # -10075 => The specified volume was not found.
-            # This can occur during controller failover.
-            if '(-10075)' in e.msg:
-                LOG.warning("Ignorning error while deleting %(volume)s:"
-                            " %(reason)s",
-                            {'volume': name, 'reason': e.msg})
-                return
-            raise
+        except stx_exception.VolumeNotFoundError as e:
+            # -10050 or -10075, see VOLUME_NOT_FOUND_CODES.
+            LOG.warning("Ignoring error while deleting %(volume)s:"
+                        " %(reason)s",
+                        {'volume': name, 'reason': e.msg})
 
     def extend_volume(self, name, added_size):
         self._request("/expand/volume", name, size=added_size)
@@ -318,13 +353,10 @@ class STXClient(object):
                 self._request("/delete/snapshot", "cleanup", snap_name)
             else:
                 self._request("/delete/snapshot", snap_name)
-        except stx_exception.RequestError as e:
-            # -10050 => The volume was not found on this system.
-            # This can occur during controller failover.
-            if '(-10050)' in e.msg:
-                LOG.warning("Ignoring unmap error -10050: %s", e.msg)
-                return None
-            raise
+        except stx_exception.VolumeNotFoundError as e:
+            # -10050 or -10075, see VOLUME_NOT_FOUND_CODES.
+            LOG.warning("Ignoring error while deleting snapshot: %s", e.msg)
+            return None
 
     def backend_exists(self, backend_name, backend_type):
         try:
@@ -501,13 +533,10 @@ class STXClient(object):
                 self._request("/unmap/volume", volume_name, initiator=host)
             else:
                 self._request("/unmap/volume", volume_name, host=host)
-        except stx_exception.RequestError as e:
-            # -10050 => The volume was not found on this system.
-            # This can occur during controller failover.
-            if '(-10050)' in e.msg:
-                LOG.warning("Ignoring unmap error -10050: %s", e.msg)
-                return None
-            raise
+        except stx_exception.VolumeNotFoundError as e:
+            # -10050 or -10075, see VOLUME_NOT_FOUND_CODES.
+            LOG.warning("Ignoring unmap error: %s", e.msg)
+            return None
 
     def get_active_target_ports(self):
         ports = []
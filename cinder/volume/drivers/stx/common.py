@@ -17,7 +17,8 @@
 """Volume driver common utilities for Seagate storage arrays."""
 
 import base64
-import uuid
+import functools
+import time
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -53,6 +54,18 @@ CONF = cfg.CONF
 CONF.register_opts(common_opts, group=configuration.SHARED_CONF_GROUP)
 CONF.register_opts(iscsi_opts, group=configuration.SHARED_CONF_GROUP)
 
+ENCODED_NAME_CACHE_SIZE = 4096
+# Seconds a refreshed set of backend stats is reused for
+STATS_CACHE_TTL = 5
+# Seconds the active iSCSI target IQNs and portals are reused for
+TARGET_PORTS_CACHE_TTL = 30
+
+
+@functools.lru_cache(maxsize=ENCODED_NAME_CACHE_SIZE)
+def _encode_uuid(name):
+    vol_bytes = bytes.fromhex(name.replace("-", ""))
+    return base64.urlsafe_b64encode(vol_bytes).decode('ascii')[:19]
+
 
 @six.add_metaclass(volume_utils.TraceWrapperMetaclass)
 class STXCommon(object):
@@ -76,6 +89,8 @@ class STXCommon(object):
                                        self.config.san_password,
                                        self.api_protocol,
                                        ssl_verify)
+        self._stats_time = None
+        self._target_ports_cache = {}
 
     def get_version(self):
         return self.VERSION
@@ -85,23 +100,11 @@ class STXCommon(object):
         self._validate_backend()
         self._get_owner_info()
         self._get_serial_number()
-        self.client_logout()
 
     def client_login(self):
-        try:
-            self.client.login()
-        except stx_exception.ConnectionError as ex:
-            msg = _("Failed to connect to %(vendor_name)s Array %(host)s: "
-                    "%(err)s") % {'vendor_name': self.vendor_name,
-                                  'host': self.config.san_ip,
-                                  'err': six.text_type(ex)}
-            LOG.error(msg)
-            raise stx_exception.ConnectionError(message=msg)
-        except stx_exception.AuthenticationError:
-            msg = _("Failed to log on %s Array "
-                    "(invalid login?).") % self.vendor_name
-            LOG.error(msg)
-            raise stx_exception.AuthenticationError(message=msg)
+        self.invalidate_target_ports_cache()
+        # The client raises user-facing connection and login errors.
+        self.client.login()
 
     def _get_serial_number(self):
         self.serialNumber = self.client.get_serial_number()
@@ -123,6 +126,10 @@ class STXCommon(object):
         volume_name = self._encode_name(volume_id)
         return "v%s" % volume_name
 
+    def _get_backend_vol_name(self, volume):
+        """Get the array name of a volume, honouring a migrated name_id."""
+        return self._get_vol_name(volume['name_id'] or volume['id'])
+
     def _get_snap_name(self, snapshot_id):
         snapshot_name = self._encode_name(snapshot_id)
         return "s%s" % snapshot_name
@@ -138,13 +145,10 @@ class STXCommon(object):
         base64 encoded string. This still exceeds the limit of 20 characters
         in some models so we return 19 characters because the
         _get_{vol,snap}_name functions prepend a character.
+
+        The conversion is pure, so results are memoized across calls.
         """
-        uuid_str = name.replace("-", "")
-        vol_uuid = uuid.UUID('urn:uuid:%s' % uuid_str)
-        vol_encoded = base64.urlsafe_b64encode(vol_uuid.bytes)
-        if six.PY3:
-            vol_encoded = vol_encoded.decode('ascii')
-        return vol_encoded[:19]
+        return _encode_uuid(name)
 
     def check_flags(self, options, required_flags):
         for flag in required_flags:
@@ -154,7 +158,6 @@ class STXCommon(object):
                 raise exception.InvalidInput(reason=msg)
 
     def create_volume(self, volume):
-        self.client_login()
         # Use base64 to encode the volume name (UUID is too long)
         volume_name = self._get_vol_name(volume['id'])
         volume_size = "%dGiB" % volume['size']
@@ -173,9 +176,6 @@ class STXCommon(object):
             LOG.exception("Creation of volume %s failed.", volume['id'])
             raise exception.Invalid(ex)
 
-        finally:
-            self.client_logout()
-
     def _assert_enough_space_for_copy(self, volume_size):
         """The array creates a snap pool before trying to copy the volume.
 
@@ -203,13 +203,9 @@ class STXCommon(object):
                   {'source_id': src_vref['id'],
                    'dest_id': volume['id'], })
 
-        if src_vref['name_id']:
-            orig_name = self._get_vol_name(src_vref['name_id'])
-        else:
-            orig_name = self._get_vol_name(src_vref['id'])
+        orig_name = self._get_backend_vol_name(src_vref)
         dest_name = self._get_vol_name(volume['id'])
 
-        self.client_login()
         try:
             self.client.copy_volume(orig_name, dest_name,
                                     self.backend_name, self.backend_type)
@@ -217,11 +213,10 @@ class STXCommon(object):
             LOG.exception("Cloning of volume %s failed.",
                           src_vref['id'])
             raise exception.Invalid(ex)
-        finally:
-            self.client_logout()
 
         if volume['size'] > src_vref['size']:
-            self.extend_volume(volume, volume['size'])
+            self.extend_volume(volume, volume['size'],
+                               old_size=src_vref['size'])
 
     def create_volume_from_snapshot(self, volume, snapshot):
         self.get_volume_stats(True)
@@ -232,7 +227,6 @@ class STXCommon(object):
 
         orig_name = self._get_snap_name(snapshot['id'])
         dest_name = self._get_vol_name(volume['id'])
-        self.client_login()
         try:
             self.client.copy_volume(orig_name, dest_name,
                                     self.backend_name, self.backend_type)
@@ -240,38 +234,30 @@ class STXCommon(object):
             LOG.exception("Create volume failed from snapshot: %s",
                           snapshot['id'])
             raise exception.Invalid(ex)
-        finally:
-            self.client_logout()
 
         if volume['size'] > snapshot['volume_size']:
-            self.extend_volume(volume, volume['size'])
+            self.extend_volume(volume, volume['size'],
+                               old_size=snapshot['volume_size'])
 
     def delete_volume(self, volume):
         LOG.debug("Deleting Volume: %s", volume['id'])
-        if volume['name_id']:
-            volume_name = self._get_vol_name(volume['name_id'])
-        else:
-            volume_name = self._get_vol_name(volume['id'])
+        volume_name = self._get_backend_vol_name(volume)
 
-        self.client_login()
         try:
             self.client.delete_volume(volume_name)
         except stx_exception.RequestError as ex:
-            # if the volume wasn't found, ignore the error
-            if 'The volume was not found on this system.' in ex.args:
-                return
             LOG.exception("Deletion of volume %s failed.", volume['id'])
             raise exception.Invalid(ex)
-        finally:
-            self.client_logout()
 
     def get_volume_stats(self, refresh):
+        # Bursts of clones each ask for fresh stats; within STATS_CACHE_TTL
+        # the last poll of the backend is reused.
         if refresh:
-            self.client_login()
-            try:
+            now = time.monotonic()
+            if (self._stats_time is None or
+                    now - self._stats_time >= STATS_CACHE_TTL):
                 self._update_volume_stats()
-            finally:
-                self.client_logout()
+                self._stats_time = now
         return self.stats
 
     def _update_volume_stats(self):
@@ -312,10 +298,7 @@ class STXCommon(object):
 
     def map_volume(self, volume, connector, connector_element):
         self._assert_connector_ok(connector, connector_element)
-        if volume['name_id']:
-            volume_name = self._get_vol_name(volume['name_id'])
-        else:
-            volume_name = self._get_vol_name(volume['id'])
+        volume_name = self._get_backend_vol_name(volume)
         try:
             data = self.client.map_volume(volume_name,
                                           connector,
@@ -327,12 +310,8 @@ class STXCommon(object):
 
     def unmap_volume(self, volume, connector, connector_element):
         self._assert_connector_ok(connector, connector_element)
-        if volume['name_id']:
-            volume_name = self._get_vol_name(volume['name_id'])
-        else:
-            volume_name = self._get_vol_name(volume['id'])
+        volume_name = self._get_backend_vol_name(volume)
 
-        self.client_login()
         try:
             self.client.unmap_volume(volume_name,
                                      connector,
@@ -340,8 +319,6 @@ class STXCommon(object):
         except stx_exception.RequestError as ex:
             LOG.exception("Error unmapping volume: %s", volume_name)
             raise exception.Invalid(ex)
-        finally:
-            self.client_logout()
 
     def get_active_fc_target_ports(self):
         try:
@@ -350,16 +327,36 @@ class STXCommon(object):
             LOG.exception("Error getting active FC target ports.")
             raise exception.Invalid(ex)
 
+    def _get_cached_target_ports(self, key, fetch):
+        """Return the result of fetch, reusing it for a short while.
+
+        The array's target port layout rarely changes, so a burst of
+        attaches shares one query per TARGET_PORTS_CACHE_TTL seconds.
+        """
+        now = time.monotonic()
+        cached = self._target_ports_cache.get(key)
+        if cached and now < cached[0]:
+            return cached[1]
+        value = fetch()
+        self._target_ports_cache[key] = (
+            now + TARGET_PORTS_CACHE_TTL, value)
+        return value
+
+    def invalidate_target_ports_cache(self):
+        self._target_ports_cache.clear()
+
     def get_active_iscsi_target_iqns(self):
         try:
-            return self.client.get_active_iscsi_target_iqns()
+            return self._get_cached_target_ports(
+                'iqns', self.client.get_active_iscsi_target_iqns)
         except stx_exception.RequestError as ex:
             LOG.exception("Error getting active ISCSI target iqns.")
             raise exception.Invalid(ex)
 
     def get_active_iscsi_target_portals(self):
         try:
-            return self.client.get_active_iscsi_target_portals()
+            return self._get_cached_target_ports(
+                'portals', self.client.get_active_iscsi_target_portals)
         except stx_exception.RequestError as ex:
             LOG.exception("Error getting active ISCSI target portals.")
             raise exception.Invalid(ex)
@@ -368,44 +365,32 @@ class STXCommon(object):
         LOG.debug("Creating snapshot (%(snap_id)s) from %(volume_id)s)",
                   {'snap_id': snapshot['id'],
                    'volume_id': snapshot['volume_id'], })
-        if snapshot['volume']['name_id']:
-            vol_name = self._get_vol_name(snapshot['volume']['name_id'])
-        else:
-            vol_name = self._get_vol_name(snapshot['volume_id'])
+        vol_name = self._get_vol_name(snapshot['volume']['name_id'] or
+                                      snapshot['volume_id'])
         snap_name = self._get_snap_name(snapshot['id'])
 
-        self.client_login()
         try:
             self.client.create_snapshot(vol_name, snap_name)
         except stx_exception.RequestError as ex:
             LOG.exception("Creation of snapshot failed for volume: %s",
                           snapshot['volume_id'])
             raise exception.Invalid(ex)
-        finally:
-            self.client_logout()
 
     def delete_snapshot(self, snapshot):
         snap_name = self._get_snap_name(snapshot['id'])
         LOG.debug("Deleting snapshot (%s)", snapshot['id'])
 
-        self.client_login()
         try:
             self.client.delete_snapshot(snap_name, self.backend_type)
         except stx_exception.RequestError as ex:
-            # if the volume wasn't found, ignore the error
-            if 'The volume was not found on this system.' in ex.args:
-                return
             LOG.exception("Deleting snapshot %s failed", snapshot['id'])
             raise exception.Invalid(ex)
-        finally:
-            self.client_logout()
 
-    def extend_volume(self, volume, new_size):
-        if volume['name_id']:
-            volume_name = self._get_vol_name(volume['name_id'])
-        else:
-            volume_name = self._get_vol_name(volume['id'])
-        old_size = self.client.get_volume_size(volume_name)
+    def extend_volume(self, volume, new_size, old_size=None):
+        volume_name = self._get_backend_vol_name(volume)
+        # Callers that just copied the volume already know its size
+        if old_size is None:
+            old_size = self.client.get_volume_size(volume_name)
         growth_size = int(new_size) - old_size
         LOG.debug("Extending Volume %(volume_name)s from %(old_size)s to "
                   "%(new_size)s, by %(growth_size)s GiB.",
@@ -415,14 +400,11 @@ class STXCommon(object):
                    'growth_size': growth_size, })
         if growth_size < 1:
             return
-        self.client_login()
         try:
             self.client.extend_volume(volume_name, "%dGiB" % growth_size)
         except stx_exception.RequestError as ex:
             LOG.exception("Extension of volume %s failed.", volume['id'])
             raise exception.Invalid(ex)
-        finally:
-            self.client_logout()
 
     def get_chap_record(self, initiator_name):
         try:
@@ -466,14 +448,10 @@ class STXCommon(object):
                 dest_id == self.serialNumber and
                 dest_owner == self.owner):
             return false_ret
-        if volume['name_id']:
-            source_name = self._get_vol_name(volume['name_id'])
-        else:
-            source_name = self._get_vol_name(volume['id'])
+        source_name = self._get_backend_vol_name(volume)
         # the array does not support duplicate names
         dest_name = "m%s" % source_name[1:]
 
-        self.client_login()
         try:
             self.client.copy_volume(source_name, dest_name,
                                     dest_back_name, self.backend_type)
@@ -483,8 +461,6 @@ class STXCommon(object):
         except stx_exception.RequestError as ex:
             LOG.exception("Error migrating volume: %s", source_name)
             raise exception.Invalid(ex)
-        finally:
-            self.client_logout()
 
     def retype(self, volume, new_type, diff, host):
         ret = self.migrate_volume(volume, host)
@@ -499,15 +475,12 @@ class STXCommon(object):
         target_vol_name = existing_ref['source-name']
         modify_target_vol_name = self._get_vol_name(volume['id'])
 
-        self.client_login()
         try:
             self.client.modify_volume_name(target_vol_name,
                                            modify_target_vol_name)
         except stx_exception.RequestError as ex:
             LOG.exception("Error manage existing volume.")
             raise exception.Invalid(ex)
-        finally:
-            self.client_logout()
 
     def manage_existing_get_size(self, volume, existing_ref):
         """Return size of volume to be managed by manage_existing.
@@ -517,12 +490,9 @@ class STXCommon(object):
         """
         target_vol_name = existing_ref['source-name']
 
-        self.client_login()
         try:
             size = self.client.get_volume_size(target_vol_name)
             return size
         except stx_exception.RequestError as ex:
             LOG.exception("Error manage existing get volume size.")
             raise exception.Invalid(ex)
-        finally:
-            self.client_logout()
@@ -35,5 +35,9 @@ class RequestError(exception.VolumeDriverException):
     message = "%(message)s"
 
 
+class VolumeNotFoundError(RequestError):
+    message = "%(message)s"
+
+
 class NotTargetPortal(exception.VolumeDriverException):
     message = _("No active iSCSI portals with supplied iSCSI IPs")
@@ -67,6 +67,11 @@ class STXFCDriver(cinder.volume.driver.FibreChannelDriver):
         self.common = self._init_common()
         self._check_flags()
         self.common.do_setup(context)
+        backend_name = self.configuration.safe_get('volume_backend_name')
+        self._stats_template = {
+            'storage_protocol': 'FC',
+            'driver_version': self.VERSION,
+            'volume_backend_name': backend_name or self.__class__.__name__}
 
     def check_for_setup_error(self):
         self._check_flags()
@@ -84,23 +89,19 @@ class STXFCDriver(cinder.volume.driver.FibreChannelDriver):
         self.common.delete_volume(volume)
 
     def initialize_connection(self, volume, connector):
-        self.common.client_login()
-        try:
-            data = {}
-            data['target_lun'] = self.common.map_volume(volume,
-                                                        connector,
-                                                        'wwpns')
-
-            ports, init_targ_map = self.get_init_targ_map(connector)
-            data['target_discovered'] = True
-            data['target_wwn'] = ports
-            data['initiator_target_map'] = init_targ_map
-            info = {'driver_volume_type': 'fibre_channel',
-                    'data': data}
-            fczm_utils.add_fc_zone(info)
-            return info
-        finally:
-            self.common.client_logout()
+        data = {}
+        data['target_lun'] = self.common.map_volume(volume,
+                                                    connector,
+                                                    'wwpns')
+
+        ports, init_targ_map = self.get_init_targ_map(connector)
+        data['target_discovered'] = True
+        data['target_wwn'] = ports
+        data['initiator_target_map'] = init_targ_map
+        info = {'driver_volume_type': 'fibre_channel',
+                'data': data}
+        fczm_utils.add_fc_zone(info)
+        return info
 
     def terminate_connection(self, volume, connector, **kwargs):
         info = {'driver_volume_type': 'fibre_channel', 'data': {}}
@@ -146,11 +147,7 @@ class STXFCDriver(cinder.volume.driver.FibreChannelDriver):
 
     def get_volume_stats(self, refresh=False):
         stats = self.common.get_volume_stats(refresh)
-        stats['storage_protocol'] = 'FC'
-        stats['driver_version'] = self.VERSION
-        backend_name = self.configuration.safe_get('volume_backend_name')
-        stats['volume_backend_name'] = (backend_name or
-                                        self.__class__.__name__)
+        stats.update(self._stats_template)
         return stats
 
     def create_export(self, context, volume, connector=None):
@@ -15,6 +15,8 @@
 #    under the License.
 #
 
+from collections import abc
+
 from oslo_log import log as logging
 
 from cinder import exception
@@ -79,21 +81,35 @@ class STXISCSIDriver(cinder.volume.driver.ISCSIDriver):
         self._check_flags()
         self.common.do_setup(context)
         self.initialize_iscsi_ports()
+        backend_name = self.configuration.safe_get('volume_backend_name')
+        self._stats_template = {
+            'storage_protocol': 'iSCSI',
+            'driver_version': self.VERSION,
+            'volume_backend_name': backend_name or self.__class__.__name__}
+        self._use_chap = bool(self.configuration.use_chap_auth)
+        if self._use_chap:
+            self._chap_secret = self.configuration.chap_password
+            # Chap secret length should be 12 to 16 characters
+            if not 12 <= len(self._chap_secret or '') <= 16:
+                msg = _('CHAP secret should be 12-16 bytes.')
+                LOG.error(msg)
+                raise exception.InvalidInput(reason=(msg))
 
     def initialize_iscsi_ports(self):
         iscsi_ips = []
         if self.iscsi_ips:
             for ip_addr in self.iscsi_ips:
-                ip = ip_addr.split(':')
-                if len(ip) == 1:
-                    iscsi_ips.append([ip_addr, DEFAULT_ISCSI_PORT])
-                elif len(ip) == 2:
-                    iscsi_ips.append([ip[0], ip[1]])
+                sep = ip_addr.rfind(':')
+                if sep < 0:
+                    host, port = ip_addr, DEFAULT_ISCSI_PORT
                 else:
+                    host, port = ip_addr[:sep], ip_addr[sep + 1:]
+                if ':' in host:
                     msg = _("Invalid IP address format: '%s'") % ip_addr
                     LOG.error(msg)
                     raise exception.InvalidInput(reason=(msg))
-            self.iscsi_ips = iscsi_ips
+                iscsi_ips.append((host, "%s:%s" % (host, port)))
+            self.iscsi_ips = tuple(iscsi_ips)
         else:
             msg = _('At least one valid iSCSI IP address must be set.')
             LOG.error(msg)
@@ -115,45 +131,42 @@ class STXISCSIDriver(cinder.volume.driver.ISCSIDriver):
         self.common.delete_volume(volume)
 
     def initialize_connection(self, volume, connector):
-        self.common.client_login()
-        try:
-            data = {}
-            data['target_lun'] = self.common.map_volume(volume,
-                                                        connector,
-                                                        'initiator')
-            iqns = self.common.get_active_iscsi_target_iqns()
-            data['target_discovered'] = True
-            data['target_iqn'] = iqns[0]
-            iscsi_portals = self.common.get_active_iscsi_target_portals()
-
-            for ip_port in self.iscsi_ips:
-                if (ip_port[0] in iscsi_portals):
-                    data['target_portal'] = ":".join(ip_port)
-                    break
-
-            if 'target_portal' not in data:
-                raise stx_exception.NotTargetPortal()
-
-            if self.configuration.use_chap_auth:
-                chap_secret = self.common.get_chap_record(
+        data = {}
+        data['target_lun'] = self.common.map_volume(volume,
+                                                    connector,
+                                                    'initiator')
+        iqns = self.common.get_active_iscsi_target_iqns()
+        data['target_discovered'] = True
+        data['target_iqn'] = iqns[0]
+        # The active portals are keyed by IP, so each configured address
+        # is matched with a single lookup.
+        iscsi_portals = self.common.get_active_iscsi_target_portals()
+        target_portal = next((portal for ip, portal in self.iscsi_ips
+                              if ip in iscsi_portals), None)
+        if target_portal is None:
+            # The cached portals may predate a port coming up
+            self.common.invalidate_target_ports_cache()
+            raise stx_exception.NotTargetPortal()
+        data['target_portal'] = target_portal
+
+        if self._use_chap:
+            chap_secret = self.common.get_chap_record(
+                connector['initiator']
+            )
+            if not chap_secret:
+                chap_secret = self.create_chap_record(
                     connector['initiator']
                 )
-                if not chap_secret:
-                    chap_secret = self.create_chap_record(
-                        connector['initiator']
-                    )
-                data['auth_password'] = chap_secret
-                data['auth_username'] = connector['initiator']
-                data['auth_method'] = 'CHAP'
-
-            info = {'driver_volume_type': 'iscsi',
-                    'data': data}
-            return info
-        finally:
-            self.common.client_logout()
+            data['auth_password'] = chap_secret
+            data['auth_username'] = connector['initiator']
+            data['auth_method'] = 'CHAP'
+
+        info = {'driver_volume_type': 'iscsi',
+                'data': data}
+        return info
 
     def terminate_connection(self, volume, connector, **kwargs):
-        if type(connector) == dict and 'initiator' in connector:
+        if isinstance(connector, abc.Mapping) and 'initiator' in connector:
             # multiattach volumes cannot be unmapped here, but will
             # be implicity unmapped when the volume is deleted.
             if not volume.get('multiattach'):
@@ -161,11 +174,7 @@ class STXISCSIDriver(cinder.volume.driver.ISCSIDriver):
 
     def get_volume_stats(self, refresh=False):
         stats = self.common.get_volume_stats(refresh)
-        stats['storage_protocol'] = 'iSCSI'
-        stats['driver_version'] = self.VERSION
-        backend_name = self.configuration.safe_get('volume_backend_name')
-        stats['volume_backend_name'] = (backend_name or
-                                        self.__class__.__name__)
+        stats.update(self._stats_template)
         return stats
 
     def create_export(self, context, volume, connector=None):
@@ -187,15 +196,9 @@ class STXISCSIDriver(cinder.volume.driver.ISCSIDriver):
         self.common.extend_volume(volume, new_size)
 
     def create_chap_record(self, initiator_name):
-        chap_secret = self.configuration.chap_password
-        # Chap secret length should be 12 to 16 characters
-        if 12 <= len(chap_secret) <= 16:
-            self.common.create_chap_record(initiator_name, chap_secret)
-        else:
-            msg = _('CHAP secret should be 12-16 bytes.')
-            LOG.error(msg)
-            raise exception.InvalidInput(reason=(msg))
-        return chap_secret
+        # The secret length was validated by do_setup
+        self.common.create_chap_record(initiator_name, self._chap_secret)
+        return self._chap_secret
 
     def retype(self, context, volume, new_type, diff, host):
         return self.common.retype(volume, new_type, diff, host)
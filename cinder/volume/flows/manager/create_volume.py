@@ -10,12 +10,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import binascii
+import functools
+import re
 import traceback
 
 from castellan import key_manager
+import eventlet
 import os_brick.initiator.connectors
-from oslo_concurrency import processutils
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import excutils
@@ -39,6 +40,7 @@ from cinder.message import message_field
 from cinder import objects
 from cinder.objects import consistencygroup
 from cinder.objects import fields
+from cinder.privsep import cryptsetup
 from cinder import utils
 from cinder.volume.flows import common
 from cinder.volume import volume_utils
@@ -46,6 +48,7 @@ from cinder.volume import volume_utils
 LOG = logging.getLogger(__name__)
 
 ACTION = 'volume:create'
+FLOW_NAME = ACTION.replace(":", "_") + "_manager"
 CONF = cfg.CONF
 
 # These attributes we will attempt to save for the volume if they exist
@@ -64,6 +67,24 @@ REKEY_SUPPORTED_CONNECTORS = (
     os_brick.initiator.connectors.fibre_channel.FibreChannelConnector,
 )
 
+# Glance locations of images stored in cinder are either cinder://<volume id>
+# or, with multiple glance stores, cinder://<store name>/<volume id>.
+CINDER_URI_RE = re.compile(
+    r'cinder://(?:[^/]+/)?'
+    r'([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})',
+    re.IGNORECASE)
+
+COPY_METADATA_LOG = _("Copying metadata from %(src_type)s %(src_id)s to "
+                      "%(vol_id)s.")
+COPY_METADATA_ERROR = _("Failed updating volume %(vol_id)s metadata using "
+                        "the provided %(src_type)s %(src_id)s metadata")
+
+
+@functools.lru_cache(maxsize=128)
+def _extract_host_cached(host):
+    """Memoized volume_utils.extract_host() for a volume's topic queue."""
+    return volume_utils.extract_host(host)
+
 
 class OnFailureRescheduleTask(flow_utils.CinderTask):
     """Triggers a rescheduling request to be sent when reverting occurs.
@@ -75,6 +96,29 @@ class OnFailureRescheduleTask(flow_utils.CinderTask):
     this volume elsewhere.
     """
 
+    # These exception types will trigger the volume to be set into error
+    # status rather than being rescheduled.
+    no_reschedule_types = (
+        # Image copying happens after volume creation so rescheduling due
+        # to copy failure will mean the same volume will be created at
+        # another place when it still exists locally.
+        exception.ImageCopyFailure,
+        # Metadata updates happen after the volume has been created so if
+        # they fail, rescheduling will likely attempt to create the volume
+        # on another machine when it still exists locally.
+        exception.MetadataCopyFailure,
+        exception.MetadataUpdateFailure,
+        # The volume/snapshot has been removed from the database, that
+        # can not be fixed by rescheduling.
+        exception.VolumeNotFound,
+        exception.SnapshotNotFound,
+        exception.VolumeTypeNotFound,
+        exception.ImageUnacceptable,
+        exception.ImageTooBig,
+        exception.InvalidSignatureImage,
+        exception.ImageSignatureVerificationException
+    )
+
     def __init__(self, reschedule_context, db, driver, scheduler_rpcapi,
                  do_reschedule):
         requires = ['filter_properties', 'request_spec', 'volume',
@@ -86,28 +130,6 @@ class OnFailureRescheduleTask(flow_utils.CinderTask):
         self.db = db
         self.driver = driver
         self.reschedule_context = reschedule_context
-        # These exception types will trigger the volume to be set into error
-        # status rather than being rescheduled.
-        self.no_reschedule_types = [
-            # Image copying happens after volume creation so rescheduling due
-            # to copy failure will mean the same volume will be created at
-            # another place when it still exists locally.
-            exception.ImageCopyFailure,
-            # Metadata updates happen after the volume has been created so if
-            # they fail, rescheduling will likely attempt to create the volume
-            # on another machine when it still exists locally.
-            exception.MetadataCopyFailure,
-            exception.MetadataUpdateFailure,
-            # The volume/snapshot has been removed from the database, that
-            # can not be fixed by rescheduling.
-            exception.VolumeNotFound,
-            exception.SnapshotNotFound,
-            exception.VolumeTypeNotFound,
-            exception.ImageUnacceptable,
-            exception.ImageTooBig,
-            exception.InvalidSignatureImage,
-            exception.ImageSignatureVerificationException
-        ]
 
     def execute(self, **kwargs):
         pass
@@ -161,7 +183,12 @@ class OnFailureRescheduleTask(flow_utils.CinderTask):
 
         if all(cause.exc_info):
             # Stringify to avoid circular ref problem in json serialization
-            retry_info['exc'] = traceback.format_exception(*cause.exc_info)
+            if CONF.reschedule_full_traceback:
+                retry_info['exc'] = traceback.format_exception(
+                    *cause.exc_info)
+            else:
+                retry_info['exc'] = traceback.format_exception_only(
+                    *cause.exc_info[:2])
 
         return create_volume(context, volume, request_spec=request_spec,
                              filter_properties=filter_properties)
@@ -187,21 +214,16 @@ class OnFailureRescheduleTask(flow_utils.CinderTask):
         # indicate that. It which will be available in flow engine store
         # through get_revert_result method.
 
-        # If do not want to be rescheduled, just set the volume's status to
-        # error and return.
-        if not self.do_reschedule:
+        # If do not want to be rescheduled, or we have a cause which can tell
+        # us not to reschedule, just set the volume's status to error and
+        # return.
+        if not self.do_reschedule or any(
+                failure.check(*self.no_reschedule_types)
+                for failure in flow_failures.values()):
             common.error_out(volume)
             LOG.error("Volume %s: create failed", volume.id)
             return False
 
-        # Check if we have a cause which can tell us not to reschedule and
-        # set the volume's status to error.
-        for failure in flow_failures.values():
-            if failure.check(*self.no_reschedule_types):
-                common.error_out(volume)
-                LOG.error("Volume %s: create failed", volume.id)
-                return False
-
         # Use a different context when rescheduling.
         if self.reschedule_context:
             cause = list(flow_failures.values())[0]
@@ -285,18 +307,22 @@ class ExtractVolumeSpecTask(flow_utils.CinderTask):
             'volume_size': volume_size,
         }
 
-        if volume.snapshot_id:
+        snapshot_id = volume.snapshot_id
+        source_volid = volume.source_volid
+        image_href = request_spec.get('image_id')
+        backup_id = request_spec.get('backup_id')
+
+        if snapshot_id:
             # We are making a snapshot based volume instead of a raw volume.
             specs.update({
                 'type': 'snap',
-                'snapshot_id': volume.snapshot_id,
+                'snapshot_id': snapshot_id,
             })
-        elif volume.source_volid:
+        elif source_volid:
             # We are making a source based volume instead of a raw volume.
             #
             # NOTE(harlowja): This will likely fail if the source volume
             # disappeared by the time this call occurred.
-            source_volid = volume.source_volid
             source_volume_ref = objects.Volume.get_by_id(context,
                                                          source_volid)
             specs.update({
@@ -307,17 +333,21 @@ class ExtractVolumeSpecTask(flow_utils.CinderTask):
                 'source_volstatus': source_volume_ref.status,
                 'type': 'source_vol',
             })
-        elif request_spec.get('image_id'):
+        elif image_href:
             # We are making an image based volume instead of a raw volume.
-            image_href = request_spec['image_id']
             image_service, image_id = get_remote_image_service(context,
                                                                image_href)
+            # The location and the metadata are independent Glance calls,
+            # so wait for both round trips at once.
+            pile = eventlet.GreenPile(2)
+            pile.spawn(image_service.get_location, context, image_id)
+            pile.spawn(image_service.show, context, image_id)
+            image_location, image_meta = pile
             specs.update({
                 'type': 'image',
                 'image_id': image_id,
-                'image_location': image_service.get_location(context,
-                                                             image_id),
-                'image_meta': image_service.show(context, image_id),
+                'image_location': image_location,
+                'image_meta': image_meta,
                 # Instead of refetching the image service later just save it.
                 #
                 # NOTE(harlowja): if we have to later recover this tasks output
@@ -326,11 +356,11 @@ class ExtractVolumeSpecTask(flow_utils.CinderTask):
                 # demand in the future.
                 'image_service': image_service,
             })
-        elif request_spec.get('backup_id'):
+        elif backup_id:
             # We are making a backup based volume instead of a raw volume.
             specs.update({
                 'type': 'backup',
-                'backup_id': request_spec['backup_id'],
+                'backup_id': backup_id,
                 # NOTE(luqitao): if the driver does not implement the method
                 # `create_volume_from_backup`, cinder-backup will update the
                 # volume's status, otherwise we need update it in the method
@@ -381,6 +411,17 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
 
     default_provides = 'volume_spec'
 
+    # Maps the volume_spec 'type' to the name of the method that creates
+    # that kind of volume. Names rather than functions are stored so the
+    # lookup goes through the instance.
+    create_methods = {
+        'raw': '_create_raw_volume',
+        'snap': '_create_from_snapshot',
+        'source_vol': '_create_from_source_volume',
+        'image': '_create_from_image',
+        'backup': '_create_from_backup',
+    }
+
     def __init__(self, manager, db, driver, image_volume_cache=None):
         super(CreateVolumeFromSpecTask, self).__init__(addons=[ACTION])
         self.manager = manager
@@ -390,6 +431,13 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
         self.message = message_api.API()
         self.backup_api = backup_api.API()
         self.backup_rpcapi = backup_rpcapi.BackupAPI()
+        self._key_mgr = None
+
+    @property
+    def key_mgr(self):
+        if self._key_mgr is None:
+            self._key_mgr = key_manager.API(CONF)
+        return self._key_mgr
 
     def _handle_bootable_volume_glance_meta(self, context, volume,
                                             **kwargs):
@@ -400,11 +448,6 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
         provided, otherwise will be treated as an empty dictionary.
         """
 
-        log_template = _("Copying metadata from %(src_type)s %(src_id)s to "
-                         "%(vol_id)s.")
-        exception_template = _("Failed updating volume %(vol_id)s metadata"
-                               " using the provided %(src_type)s"
-                               " %(src_id)s metadata")
         src_type = None
         src_id = None
         volume_utils.enable_bootable_flag(volume)
@@ -413,18 +456,18 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                 src_type = 'snapshot'
                 src_id = kwargs['snapshot_id']
                 snapshot_id = src_id
-                LOG.debug(log_template, {'src_type': src_type,
-                                         'src_id': src_id,
-                                         'vol_id': volume.id})
+                LOG.debug(COPY_METADATA_LOG, {'src_type': src_type,
+                                              'src_id': src_id,
+                                              'vol_id': volume.id})
                 self.db.volume_glance_metadata_copy_to_volume(
                     context, volume.id, snapshot_id)
             elif kwargs.get('source_volid'):
                 src_type = 'source volume'
                 src_id = kwargs['source_volid']
                 source_volid = src_id
-                LOG.debug(log_template, {'src_type': src_type,
-                                         'src_id': src_id,
-                                         'vol_id': volume.id})
+                LOG.debug(COPY_METADATA_LOG, {'src_type': src_type,
+                                              'src_id': src_id,
+                                              'vol_id': volume.id})
                 self.db.volume_glance_metadata_copy_from_volume_to_volume(
                     context,
                     source_volid,
@@ -434,9 +477,9 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                 src_id = kwargs['image_id']
                 image_id = src_id
                 image_meta = kwargs.get('image_meta', {})
-                LOG.debug(log_template, {'src_type': src_type,
-                                         'src_id': src_id,
-                                         'vol_id': volume.id})
+                LOG.debug(COPY_METADATA_LOG, {'src_type': src_type,
+                                              'src_id': src_id,
+                                              'vol_id': volume.id})
                 self._capture_volume_image_metadata(context, volume.id,
                                                     image_id, image_meta)
         except exception.GlanceMetadataNotFound:
@@ -445,9 +488,9 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
             # volume glance metadata table
             pass
         except exception.CinderException as ex:
-            LOG.exception(exception_template, {'src_type': src_type,
-                                               'src_id': src_id,
-                                               'vol_id': volume.id})
+            LOG.exception(COPY_METADATA_ERROR, {'src_type': src_type,
+                                                'src_id': src_id,
+                                                'vol_id': volume.id})
             raise exception.MetadataCopyFailure(reason=ex)
 
     def _create_from_snapshot(self, context, volume, snapshot_id,
@@ -463,9 +506,8 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
         # will not destroy the volume (although they could in the future).
         make_bootable = False
         try:
-            originating_vref = objects.Volume.get_by_id(context,
+            make_bootable = self.db.volume_bootable_get(context,
                                                         snapshot.volume_id)
-            make_bootable = originating_vref.bootable
         except exception.CinderException as ex:
             LOG.exception("Failed fetching snapshot %(snapshot_id)s bootable"
                           " flag using the provided glance snapshot "
@@ -479,25 +521,27 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
         return model_update
 
     @staticmethod
-    def _setup_encryption_keys(context, volume, encryption):
+    def _setup_encryption_keys(context, volume, encryption, keymgr=None):
         """Return encryption keys in passphrase form for a clone operation.
 
         :param context: context
         :param volume: volume being cloned
         :param encryption: encryption info dict
+        :param keymgr: key manager API to use, created if not provided
 
         :returns: tuple (source_pass, new_pass, new_key_id)
         """
 
-        keymgr = key_manager.API(CONF)
+        if keymgr is None:
+            keymgr = key_manager.API(CONF)
         key = keymgr.get(context, encryption['encryption_key_id'])
-        source_pass = binascii.hexlify(key.get_encoded()).decode('utf-8')
+        source_pass = key.get_encoded().hex()
 
         new_key_id = volume_utils.create_encryption_key(context,
                                                         keymgr,
                                                         volume.volume_type_id)
         new_key = keymgr.get(context, new_key_id)
-        new_pass = binascii.hexlify(new_key.get_encoded()).decode('utf-8')
+        new_pass = new_key.get_encoded().hex()
 
         return (source_pass, new_pass, new_key_id)
 
@@ -509,20 +553,21 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
 
         LOG.debug('rekey volume %s', volume.name)
 
-        properties = volume_utils.brick_get_connector_properties(False, False)
+        properties = volume_utils.brick_get_cached_connector_properties(
+            False, False)
         LOG.debug("properties: %s", properties)
         attach_info = None
         model_update = {}
         new_key_id = None
         original_key_id = volume.encryption_key_id
-        key_mgr = key_manager.API(CONF)
+        key_mgr = self.key_mgr
 
         try:
             attach_info, volume = self.driver._attach_volume(context,
                                                              volume,
                                                              properties)
-            if not any(c for c in REKEY_SUPPORTED_CONNECTORS
-                       if isinstance(attach_info['connector'], c)):
+            if not isinstance(attach_info['connector'],
+                              REKEY_SUPPORTED_CONNECTORS):
                 LOG.debug('skipping rekey, connector: %s',
                           attach_info['connector'])
                 raise exception.RekeyNotSupported()
@@ -547,20 +592,15 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
             (source_pass, new_pass, new_key_id) = self._setup_encryption_keys(
                 context,
                 volume,
-                encryption)
+                encryption,
+                keymgr=key_mgr)
 
             if image_info.encrypted == 'yes':
                 key_str = source_pass + "\n" + new_pass + "\n"
                 del source_pass
 
-                (out, err) = utils.execute(
-                    'cryptsetup',
-                    'luksChangeKey',
-                    attach_info['device']['path'],
-                    '--force-password',
-                    run_as_root=True,
-                    process_input=key_str,
-                    log_errors=processutils.LOG_ALL_ERRORS)
+                cryptsetup.luks_change_key(attach_info['device']['path'],
+                                           key_str)
 
                 del key_str
                 model_update = {'encryption_key_id': new_key_id}
@@ -578,18 +618,11 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                     # compatibility with new versions of cryptsetup.
                     encryption['provider'] = 'luks1'
 
-                (out, err) = utils.execute(
-                    'cryptsetup',
-                    '--batch-mode',
-                    'luksFormat',
-                    '--force-password',
-                    '--type', encryption['provider'],
-                    '--cipher', encryption['cipher'],
-                    '--key-size', str(encryption['key_size']),
-                    '--key-file=-',
-                    attach_info['device']['path'],
-                    run_as_root=True,
-                    process_input=new_pass)
+                cryptsetup.luks_format(attach_info['device']['path'],
+                                       encryption['provider'],
+                                       encryption['cipher'],
+                                       encryption['key_size'],
+                                       new_pass)
                 del new_pass
                 model_update = {'encryption_key_id': new_key_id}
 
@@ -656,6 +689,24 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
         self.db.volume_glance_metadata_bulk_create(context, volume_id,
                                                    volume_metadata)
 
+    @staticmethod
+    def _parse_cinder_url(url):
+        """Return the volume id of a cinder:// URL, or None."""
+        if not url.startswith('cinder://'):
+            return None
+        match = CINDER_URI_RE.fullmatch(url)
+        if not match:
+            LOG.debug("Ignoring malformed image location uri '%(url)s'",
+                      {'url': url})
+            return None
+        return match.group(1)
+
+    @classmethod
+    def _extract_cinder_ids(cls, urls):
+        """Return the volume ids of the cinder:// URLs among the given URLs."""
+        return [volume_id for volume_id in map(cls._parse_cinder_url, urls)
+                if volume_id]
+
     def _clone_image_volume(self, context, volume, image_location, image_meta):
         """Create a volume efficiently from an existing image.
 
@@ -663,38 +714,51 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
         boolean indicating whether cloning occurred
         """
         # NOTE (lixiaoy1): currently can't create volume from source vol with
-        # different encryptions, so just return.
-        if not image_location or volume.encryption_key_id:
+        # different encryptions, so callers must not use this for encrypted
+        # volumes.
+        if not image_location:
             return None, False
 
-        if (image_meta.get('container_format') != 'bare' or
-                image_meta.get('disk_format') != 'raw'):
+        if ((image_meta.get('container_format'),
+             image_meta.get('disk_format')) != ('bare', 'raw')):
             LOG.info("Requested image %(id)s is not in raw format.",
                      {'id': image_meta.get('id')})
             return None, False
 
         image_volume = None
         direct_url, locations = image_location
-        urls = set([direct_url] + [loc.get('url') for loc in locations or []])
-        image_volume_ids = [url[9:] for url in urls
-                            if url and url.startswith('cinder://')]
+        urls = {url for url in (direct_url,
+                                *(loc.get('url') for loc in locations or ()))
+                if url}
+        image_volume_ids = self._extract_cinder_ids(urls)
+        if not image_volume_ids:
+            return None, False
+
+        image_owner_id = image_meta['owner']
+        owned_by_project = image_owner_id == volume['project_id']
+        filters = {'id': image_volume_ids}
+        if not owned_by_project and image_owner_id is not None:
+            # Only image volumes kept for the image owner are accessible,
+            # so let the database drop the others. An image without owner
+            # matches image volumes without image_owner metadata, which a
+            # metadata filter cannot express, so that is left to the check
+            # below.
+            filters['metadata'] = {'image_owner': image_owner_id}
         image_volumes = self.db.volume_get_all_by_host(
-            context, volume['host'], filters={'id': image_volume_ids})
+            context, volume['host'], filters=filters)
 
         for image_volume in image_volumes:
             # For the case image volume is stored in the service tenant,
             # image_owner volume metadata should also be checked.
-            image_owner = None
-            volume_metadata = image_volume.get('volume_metadata') or {}
-            for m in volume_metadata:
-                if m['key'] == 'image_owner':
-                    image_owner = m['value']
-            if (image_meta['owner'] != volume['project_id'] and
-                    image_meta['owner'] != image_owner):
-                LOG.info("Skipping image volume %(id)s because "
-                         "it is not accessible by current Tenant.",
-                         {'id': image_volume.id})
-                continue
+            if not owned_by_project:
+                volume_metadata = image_volume.get('volume_metadata') or ()
+                image_owner = next((m['value'] for m in volume_metadata
+                                    if m['key'] == 'image_owner'), None)
+                if image_owner_id != image_owner:
+                    LOG.info("Skipping image volume %(id)s because "
+                             "it is not accessible by current Tenant.",
+                             {'id': image_volume.id})
+                    continue
 
             LOG.info("Will clone a volume from the image volume "
                      "%(id)s.", {'id': image_volume.id})
@@ -744,12 +808,14 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
         return model_update
 
     def _create_from_image_cache(self, context, internal_context, volume,
-                                 image_id, image_meta):
+                                 image_id, image_meta, cache_entry=None):
         """Attempt to create the volume using the image cache.
 
         Best case this will simply clone the existing volume in the cache.
         Worst case the image is out of date and will be evicted. In that case
         a clone will not be created and the image must be downloaded again.
+        If the caller already looked up cache_entry it is used as is,
+        otherwise it is fetched here.
         """
         LOG.debug('Attempting to retrieve cache entry for image = '
                   '%(image_id)s on host %(host)s.',
@@ -760,10 +826,9 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
             return None, False
 
         try:
-            cache_entry = self.image_volume_cache.get_entry(internal_context,
-                                                            volume,
-                                                            image_id,
-                                                            image_meta)
+            if cache_entry is None:
+                cache_entry = self.image_volume_cache.get_entry(
+                    internal_context, volume, image_id, image_meta)
             if cache_entry:
                 LOG.debug('Creating from source image-volume %(volume_id)s',
                           {'volume_id': cache_entry['volume_id']})
@@ -786,6 +851,21 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                         'clone. Image will be downloaded from Glance.')
         return None, False
 
+    def _maybe_get_cache_entry(self, volume, image_id, image_meta):
+        """Look up the image cache entry without taking the image lock.
+
+        Returns None when the entry is missing or when there is no Cinder
+        internal context to look it up with.
+        """
+        internal_context = cinder_context.get_internal_tenant_context()
+        if not internal_context:
+            return None
+
+        return self.image_volume_cache.get_entry(internal_context,
+                                                 volume,
+                                                 image_id,
+                                                 image_meta)
+
     @coordination.synchronized('{image_id}')
     def _prepare_image_cache_entry(self, context, volume,
                                    image_location, image_id,
@@ -799,9 +879,10 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                                                         image_id,
                                                         image_meta)
 
-        # If the entry is in the cache then return ASAP in order to minimize
-        # the scope of the lock. If it isn't in the cache then do the work
-        # that adds it. The work is done inside the locked region to ensure
+        # Callers check the cache before taking the lock, so this is the
+        # second look: another request may have created the entry while
+        # we were waiting. If it isn't in the cache then do the work that
+        # adds it. The work is done inside the locked region to ensure
         # only one cache entry is created.
         if cache_entry:
             LOG.debug('Found cache entry for image = '
@@ -825,7 +906,8 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
     def _create_from_image_cache_or_download(self, context, volume,
                                              image_location, image_id,
                                              image_meta, image_service,
-                                             update_cache=False):
+                                             update_cache=False,
+                                             cache_entry=None):
         # NOTE(e0ne): check for free space in image_conversion_dir before
         # image downloading.
         # NOTE(mnaser): This check *only* happens if the backend is not able
@@ -855,14 +937,15 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
             if not internal_context:
                 LOG.info('Unable to get Cinder internal context, will '
                          'not use image-volume cache.')
-            else:
+            elif not update_cache:
                 try:
                     model_update, cloned = self._create_from_image_cache(
                         context,
                         internal_context,
                         volume,
                         image_id,
-                        image_meta
+                        image_meta,
+                        cache_entry=cache_entry
                     )
                 except exception.SnapshotLimitReached:
                     # This exception will be handled by the caller's
@@ -876,18 +959,20 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                                 'Error: %(exception)s',
                                 {'exception': e})
 
-                # Don't cache unless directed.
-                if not cloned and update_cache:
-                    should_create_cache_entry = True
-                    # cleanup consistencygroup field in the volume,
-                    # because when creating cache entry, it will need
-                    # to update volume object.
-                    self._cleanup_cg_in_volume(volume)
+            else:
+                # Only _prepare_image_cache_entry() asks for the cache to
+                # be updated, and it has just seen a miss while holding the
+                # image lock, so don't look the entry up a second time.
+                should_create_cache_entry = True
+                # cleanup consistencygroup field in the volume,
+                # because when creating cache entry, it will need
+                # to update volume object.
+                self._cleanup_cg_in_volume(volume)
 
         # Fall back to default behavior of creating volume,
         # download the image data and copy it into the volume.
         original_size = volume.size
-        backend_name = volume_utils.extract_host(volume.service_topic_queue)
+        backend_name = _extract_host_cached(volume.service_topic_queue)
         try:
             if not cloned:
                 try:
@@ -913,10 +998,12 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                         virtual_size = image_utils.check_virtual_size(
                             data.virtual_size, volume.size, image_id)
 
+                        # The new size is persisted together with the
+                        # creation model update in
+                        # _create_from_image_download().
                         if should_create_cache_entry:
                             if virtual_size and virtual_size != original_size:
                                 volume.size = virtual_size
-                                volume.save()
                         model_update = self._create_from_image_download(
                             context,
                             volume,
@@ -1002,26 +1089,34 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                                                            image_service)
 
         # Try and clone the image if we have it set as a glance location.
-        if not cloned and 'cinder' in CONF.allowed_direct_url_schemes:
+        if (not cloned and not volume_is_encrypted and
+                'cinder' in CONF.allowed_direct_url_schemes):
             model_update, cloned = self._clone_image_volume(context,
                                                             volume,
                                                             image_location,
                                                             image_meta)
 
         # If we're going to try using the image cache then prepare the cache
-        # entry. Note: encrypted volume images are not cached.
+        # entry. Note: encrypted volume images are not cached. The lock is
+        # only taken when the entry is missing, so cache hits for the same
+        # image are not serialized.
+        cache_entry = None
         if not cloned and self.image_volume_cache and not volume_is_encrypted:
-            # If _prepare_image_cache_entry() has to create the cache entry
-            # then it will also create the volume. But if the volume image
-            # is already in the cache then it returns (None, False), and
-            # _create_from_image_cache_or_download() will use the cache.
-            model_update, cloned = self._prepare_image_cache_entry(
-                context,
-                volume,
-                image_location,
-                image_id,
-                image_meta,
-                image_service)
+            cache_entry = self._maybe_get_cache_entry(volume, image_id,
+                                                      image_meta)
+            if not cache_entry:
+                # If _prepare_image_cache_entry() has to create the cache
+                # entry then it will also create the volume. But if the
+                # volume image was added to the cache meanwhile then it
+                # returns (None, False), and
+                # _create_from_image_cache_or_download() will use the cache.
+                model_update, cloned = self._prepare_image_cache_entry(
+                    context,
+                    volume,
+                    image_location,
+                    image_id,
+                    image_meta,
+                    image_service)
 
         # Try and use the image cache, and download if not cached.
         if not cloned:
@@ -1031,7 +1126,8 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                 image_location,
                 image_id,
                 image_meta,
-                image_service)
+                image_service,
+                cache_entry=cache_entry)
 
         self._handle_bootable_volume_glance_meta(context, volume,
                                                  image_id=image_id,
@@ -1119,25 +1215,14 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                  "with specification: %(volume_spec)s",
                  {'volume_spec': volume_spec, 'volume_id': volume_id,
                   'create_type': create_type})
-        if create_type == 'raw':
-            model_update = self._create_raw_volume(
-                context, volume, **volume_spec)
-        elif create_type == 'snap':
-            model_update = self._create_from_snapshot(context, volume,
-                                                      **volume_spec)
-        elif create_type == 'source_vol':
-            model_update = self._create_from_source_volume(
-                context, volume, **volume_spec)
-        elif create_type == 'image':
-            model_update = self._create_from_image(context,
-                                                   volume,
-                                                   **volume_spec)
-        elif create_type == 'backup':
-            model_update, need_update_volume = self._create_from_backup(
-                context, volume, **volume_spec)
-            volume_spec.update({'need_update_volume': need_update_volume})
-        else:
+        method_name = self.create_methods.get(create_type)
+        if method_name is None:
             raise exception.VolumeTypeNotFound(volume_type_id=create_type)
+        model_update = getattr(self, method_name)(context, volume,
+                                                  **volume_spec)
+        if create_type == 'backup':
+            model_update, need_update_volume = model_update
+            volume_spec.update({'need_update_volume': need_update_volume})
 
         # Persist any model information provided on creation.
         try:
@@ -1236,8 +1321,7 @@ def get_flow(context, manager, db, driver, scheduler_rpcapi, host, volume,
        creation has ended and performs further database status updates.
     """
 
-    flow_name = ACTION.replace(":", "_") + "_manager"
-    volume_flow = linear_flow.Flow(flow_name)
+    volume_flow = linear_flow.Flow(FLOW_NAME)
 
     # This injects the initial starting flow values into the workflow so that
     # the dependency order of the tasks provides/requires can be correctly
@@ -1249,21 +1333,21 @@ def get_flow(context, manager, db, driver, scheduler_rpcapi, host, volume,
         'volume': volume,
     }
 
-    volume_flow.add(ExtractVolumeRefTask(db, host, set_error=False))
-
-    retry = filter_properties.get('retry', None)
+    retry = filter_properties.get('retry')
 
     # Always add OnFailureRescheduleTask and we handle the change of volume's
     # status when reverting the flow. Meanwhile, no need to revert process of
     # ExtractVolumeRefTask.
-    do_reschedule = allow_reschedule and request_spec and retry
-    volume_flow.add(OnFailureRescheduleTask(reschedule_context, db, driver,
-                                            scheduler_rpcapi, do_reschedule))
+    do_reschedule = bool(allow_reschedule and request_spec is not None and
+                         retry)
 
     LOG.debug("Volume reschedule parameters: %(allow)s "
               "retry: %(retry)s", {'allow': allow_reschedule, 'retry': retry})
 
-    volume_flow.add(ExtractVolumeSpecTask(db),
+    volume_flow.add(ExtractVolumeRefTask(db, host, set_error=False),
+                    OnFailureRescheduleTask(reschedule_context, db, driver,
+                                            scheduler_rpcapi, do_reschedule),
+                    ExtractVolumeSpecTask(db),
                     NotifyVolumeActionTask(db, "create.start"),
                     CreateVolumeFromSpecTask(manager,
                                              db,
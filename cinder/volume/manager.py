@@ -132,6 +132,12 @@ volume_manager_opts = [
                     'from the backend.  Be aware that generating usage '
                     'statistics is expensive for some backends, so setting '
                     'this value too low may adversely affect performance.'),
+    cfg.BoolOpt('reschedule_full_traceback',
+                default=True,
+                help='Send the full traceback of a failed volume creation '
+                     'to the scheduler when it is rescheduled, so it is '
+                     'logged there. If disabled only the exception type and '
+                     'message are sent, which is cheaper to build.'),
 ]
 
 volume_backend_opts = [
@@ -437,6 +443,10 @@ class VolumeManager(manager.CleanableManager,
                   'host': self.host, 'cluster': self.cluster,
                   'num_cache': num_cache})
 
+    def reset(self) -> None:
+        super(VolumeManager, self).reset()
+        volume_utils.clear_connector_properties_cache()
+
     def init_host(self,   # type: ignore
                   added_to_cluster=None,
                   **kwargs) -> None:
@@ -87,6 +87,10 @@ VALID_TRACE_FLAGS = {'method', 'api'}
 TRACE_API = False
 TRACE_METHOD = False
 
+# Connector properties of this host, keyed on the multipath flags used to
+# gather them.  Cleared when the volume service is reset (SIGHUP).
+CONNECTOR_PROPERTIES: Dict[Tuple[bool, bool], dict] = {}
+
 
 def null_safe_str(s: Optional[str]) -> str:
     return str(s) if s else ''
@@ -1427,6 +1431,27 @@ def brick_get_connector_properties(multipath: bool = False,
                                               enforce_multipath)
 
 
+def brick_get_cached_connector_properties(multipath: bool = False,
+                                          enforce_multipath: bool = False):
+    """Return this host's connector properties, gathering them only once.
+
+    Gathering the properties runs several commands (initiator name, HBAs,
+    multipathd...) whose output only changes when the host is reconfigured.
+    Callers get their own copy of the cached dict.
+    """
+    key = (multipath, enforce_multipath)
+    properties = CONNECTOR_PROPERTIES.get(key)
+    if properties is None:
+        properties = brick_get_connector_properties(multipath,
+                                                    enforce_multipath)
+        CONNECTOR_PROPERTIES[key] = properties
+    return dict(properties)
+
+
+def clear_connector_properties_cache() -> None:
+    CONNECTOR_PROPERTIES.clear()
+
+
 def brick_get_connector(protocol: str,
                         driver=None,
                         use_multipath: bool = False,